@@ -0,0 +1,112 @@
+"""
+本地 OpenAI 兼容的模拟模型服务，支持流式和非流式的 chat/completions 以及 embeddings
+返回的 SQL 只依赖问题内容，延迟固定，保证基准测试结果可复现
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_TABLE_RE = re.compile(r'表\s*(\w+)')
+
+
+def answer_for(question: str) -> str:
+    """问题中 “表 xxx” 指定要统计的表，模型在 SQL 之后还会输出一段解释"""
+    match = _TABLE_RE.search(question)
+    table = match.group(1) if match else 'sqlite_master'
+    sql = f"SELECT COUNT(*) AS cnt FROM {table}"
+    return f"根据schema，SQL如下：\n```sql\n{sql}\n```\n解释：统计该表的记录数。" + "这条SQL直接对整张表计数。" * 20
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 首个 token 延迟和每个增量块的间隔（秒）
+    first_token_latency = 0.05
+    chunk_interval = 0.002
+    chunk_size = 8
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if self.path.endswith('/embeddings'):
+            inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+            data = [{"object": "embedding", "index": i, "embedding": [float(len(t) % 7), 1.0, float(len(t) % 3)]}
+                    for i, t in enumerate(inputs)]
+            self._send_json({"object": "list", "data": data, "model": body.get('model', 'mock'),
+                             "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+            return
+
+        question = body['messages'][-1]['content']
+        content = answer_for(question)
+        prompt_chars = sum(len(m['content']) for m in body['messages'])
+        time.sleep(self.first_token_latency)
+        if not body.get('stream'):
+            time.sleep(self.chunk_interval * (len(content) // self.chunk_size))
+            self._send_json({
+                "id": "mock", "object": "chat.completion", "created": 0, "model": body.get('model', 'mock'),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_chars, "completion_tokens": len(content),
+                          "total_tokens": prompt_chars + len(content)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for i in range(0, len(content), self.chunk_size):
+                chunk = {"id": "mock", "object": "chat.completion.chunk", "created": 0, "model": "mock",
+                         "choices": [{"index": 0, "delta": {"content": content[i:i + self.chunk_size]},
+                                      "finish_reason": None}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                time.sleep(self.chunk_interval)
+            if (body.get('stream_options') or {}).get('include_usage'):
+                usage = {"id": "mock", "object": "chat.completion.chunk", "created": 0, "model": "mock", "choices": [],
+                         "usage": {"prompt_tokens": prompt_chars, "completion_tokens": len(content),
+                                   "total_tokens": prompt_chars + len(content)}}
+                self._write_chunk(f"data: {json.dumps(usage)}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端拿到 SQL 后提前断开
+            pass
+
+
+def start_mock_llm(host: str = '127.0.0.1', port: int = 0, first_token_latency: float = 0.05,
+                   chunk_interval: float = 0.002) -> ThreadingHTTPServer:
+    """在后台线程启动模拟服务，port=0 时自动选择空闲端口，返回的 server.server_address 为实际地址"""
+    handler = type('ConfiguredMockLLMHandler', (MockLLMHandler,),
+                   {"first_token_latency": first_token_latency, "chunk_interval": chunk_interval})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Mock OpenAI-compatible endpoint')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--first-token-latency', type=float, default=0.05)
+    parser.add_argument('--chunk-interval', type=float, default=0.002)
+    args = parser.parse_args()
+    server = start_mock_llm(port=args.port, first_token_latency=args.first_token_latency,
+                            chunk_interval=args.chunk_interval)
+    print(f"mock llm listening on http://127.0.0.1:{server.server_address[1]}/v1")
+    threading.Event().wait()
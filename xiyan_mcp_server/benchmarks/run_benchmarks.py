@@ -0,0 +1,269 @@
+"""
+XiYan MCP Server 基准测试
+
+在合成 SQLite 库上测量：
+  import         新进程中 import server 的耗时（stdio 客户端每个会话都会启动一次服务进程）
+  introspection  init_mschema 内省耗时
+  render         to_mschema 渲染耗时（冷/热）、完整与裁剪后的 prompt 大小
+  examples       examples_to_str 耗时
+  e2e            本地模拟模型服务下工具调用的端到端延迟 p50/p99
+
+所有随机性都由 --seed 控制，相同参数的多次运行可以直接对比；
+用 --output 保存结果，之后用 --compare 与新版本的结果对比
+
+    python benchmarks/run_benchmarks.py --tables 200 --columns 20 --rows 500 --output base.json
+    python benchmarks/run_benchmarks.py --tables 200 --columns 20 --rows 500 --compare base.json
+"""
+import argparse
+import asyncio
+import datetime
+import decimal
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src', 'xiyan_mcp_server'))
+
+from mock_llm import start_mock_llm
+from synthetic_db import build_synthetic_db, table_names
+
+
+def percentile(values: list, pct: float) -> float:
+    """nearest-rank 百分位"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(values: list) -> dict:
+    return {
+        "min_ms": round(min(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(values) * 1000, 3),
+        "n": len(values),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return ''
+
+
+def bench_import(repeats: int):
+    """每次在新的解释器进程中计时 import server，不受当前进程已导入模块的影响"""
+    src_dir = os.path.join(BENCH_DIR, '..', 'src', 'xiyan_mcp_server')
+    code = "import time; start = time.perf_counter(); import server; print(time.perf_counter() - start)"
+    imports, processes = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=src_dir, text=True,
+                                         stderr=subprocess.DEVNULL)
+        processes.append(time.perf_counter() - start)
+        imports.append(float(output.strip().splitlines()[-1]))
+    return {"import": summarize(imports), "process": summarize(processes)}
+
+
+def bench_introspection(db_config, repeats: int):
+    from datasource.db_source import HITLSQLDatabase
+    from utils.db_util import init_db_conn
+
+    timings = []
+    db_source = None
+    for _ in range(repeats):
+        engine = init_db_conn(db_config)
+        start = time.perf_counter()
+        db_source = HITLSQLDatabase(engine)
+        timings.append(time.perf_counter() - start)
+        engine.dispose()
+    return summarize(timings), db_source
+
+
+def bench_render(db_source, questions: list, repeats: int, seed: int, link_top_k: int, link_min_tables: int):
+    from database_env import DataBaseEnv
+
+    mschema = db_source.mschema
+    cold, warm = [], []
+    for _ in range(repeats):
+        mschema.invalidate()
+        start = time.perf_counter()
+        full_prompt = mschema.to_mschema(seed=seed)
+        cold.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        mschema.to_mschema(seed=seed)
+        warm.append(time.perf_counter() - start)
+
+    env = DataBaseEnv(db_source, link_top_k=link_top_k, link_min_tables=link_min_tables, render_seed=seed)
+    linked_sizes, linked = [], []
+    for question in questions:
+        start = time.perf_counter()
+        prompt = env.get_mschema_str(question)
+        linked.append(time.perf_counter() - start)
+        linked_sizes.append(len(prompt.encode('utf-8')))
+    return {
+        "cold": summarize(cold),
+        "warm": summarize(warm),
+        "linked": summarize(linked),
+        "full_prompt_chars": len(full_prompt),
+        "full_prompt_bytes": len(full_prompt.encode('utf-8')),
+        "linked_prompt_bytes_p50": percentile(linked_sizes, 50),
+        "linked_prompt_bytes_max": max(linked_sizes),
+    }
+
+
+def bench_examples(seed: int, lists: int, list_len: int = 5):
+    from utils.db_util import examples_to_str
+
+    rng = random.Random(seed)
+    makers = [
+        lambda: rng.randint(0, 10 ** 6),
+        lambda: decimal.Decimal(f"{rng.uniform(0, 1000):.2f}"),
+        lambda: f"name_{rng.randint(0, 1000)}",
+        lambda: datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randint(0, 1000)),
+        lambda: None,
+    ]
+    samples = [[rng.choice(makers)() for _ in range(list_len)] for _ in range(lists)]
+    start = time.perf_counter()
+    for sample in samples:
+        examples_to_str(list(sample))
+    elapsed = time.perf_counter() - start
+    return {"total_ms": round(elapsed * 1000, 3), "per_call_us": round(elapsed / lists * 1e6, 3), "calls": lists}
+
+
+def bench_e2e(questions: list, concurrency: int, warmup: int):
+    import server
+
+    async def one(question: str, semaphore: asyncio.Semaphore, timings: list, failures: list):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await server.get_data_via_natual_language(question)
+            timings.append(time.perf_counter() - start)
+            if '| cnt |' not in result[0].text:
+                failures.append(result[0].text[:200])
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+        for question in questions[:warmup]:
+            await one(question, semaphore, [], [])
+        timings, failures = [], []
+        start = time.perf_counter()
+        await asyncio.gather(*(one(q, semaphore, timings, failures) for q in questions[warmup:]))
+        return timings, failures, time.perf_counter() - start
+
+    timings, failures, wall = asyncio.run(run_all())
+    result = summarize(timings)
+    result["failures"] = len(failures)
+    result["throughput_rps"] = round(len(timings) / wall, 2) if wall else 0.0
+    return result
+
+
+def compare(current: dict, baseline: dict):
+    """打印与基线结果的差异，只对比毫秒和字节类指标"""
+    def flatten(prefix, node, out):
+        for key, value in node.items():
+            path = f"{prefix}.{key}" if prefix else key
+            if isinstance(value, dict):
+                flatten(path, value, out)
+            elif isinstance(value, (int, float)) and (key.endswith('_ms') or 'bytes' in key or key.endswith('_us')):
+                out[path] = value
+        return out
+
+    if current.get("params") != baseline.get("params"):
+        print("warning: benchmark parameters differ from the baseline, results are not directly comparable")
+    cur = flatten('', current["results"], {})
+    base = flatten('', baseline["results"], {})
+    print(f"{'metric':<40}{'baseline':>14}{'current':>14}{'change':>10}")
+    for path in sorted(cur):
+        if path not in base:
+            continue
+        change = (cur[path] - base[path]) / base[path] * 100 if base[path] else 0.0
+        print(f"{path:<40}{base[path]:>14}{cur[path]:>14}{change:>9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='XiYan MCP Server benchmarks')
+    parser.add_argument('--tables', type=int, default=50)
+    parser.add_argument('--columns', type=int, default=12)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=5, help='repeats for introspection and render timings')
+    parser.add_argument('--requests', type=int, default=50, help='end-to-end tool calls')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--link-top-k', type=int, default=8)
+    parser.add_argument('--link-min-tables', type=int, default=20)
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='mock time to first token (seconds)')
+    parser.add_argument('--with-caches', action='store_true', help='keep question/result caches on during e2e')
+    parser.add_argument('--skip-e2e', action='store_true')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'xiyan_benchmarks'))
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON produced by --output')
+    args = parser.parse_args()
+
+    params = {k: getattr(args, k) for k in ('tables', 'columns', 'rows', 'seed', 'repeats', 'requests',
+                                             'concurrency', 'warmup', 'link_top_k', 'link_min_tables',
+                                             'llm_latency', 'with_caches')}
+    rng = random.Random(args.seed)
+    names = table_names(args.tables)
+    questions = [f"统计表 {rng.choice(names)} 的记录数（第{i}次）" for i in range(args.requests + args.warmup)]
+
+    mock = start_mock_llm(first_token_latency=args.llm_latency)
+    os.environ.update({
+        "MODEL_NAME": "mock", "MODEL_KEY": "bench",
+        "MODEL_URL": f"http://127.0.0.1:{mock.server_address[1]}/v1",
+        "SCHEMA_LINK_TOP_K": str(args.link_top_k), "SCHEMA_LINK_MIN_TABLES": str(args.link_min_tables),
+        "MSCHEMA_RENDER_SEED": str(args.seed),
+    })
+    if args.with_caches:
+        os.environ.setdefault("RESULT_CACHE_MB", "64")
+    else:
+        os.environ.update({"QUESTION_CACHE_SIZE": "0", "RESULT_CACHE_MB": "0"})
+
+    start = time.perf_counter()
+    db_config = build_synthetic_db(args.data_dir, args.tables, args.columns, args.rows, args.seed)
+    build_seconds = time.perf_counter() - start
+
+    registry_path = os.path.join(args.data_dir, 'databases.json')
+    with open(registry_path, 'w', encoding='utf-8') as f:
+        json.dump({"default": "bench", "databases": {"bench": {"dialect": "sqlite", "db_path": db_config.db_path}}}, f)
+    os.environ["XIYAN_DB_CONFIG"] = registry_path
+
+    results = {}
+    results["startup"] = bench_import(args.repeats)
+    results["introspection"], db_source = bench_introspection(db_config, args.repeats)
+    results["render"] = bench_render(db_source, questions, args.repeats, args.seed, args.link_top_k, args.link_min_tables)
+    results["examples"] = bench_examples(args.seed, 10000)
+    if not args.skip_e2e:
+        results["e2e"] = bench_e2e(questions, args.concurrency, args.warmup)
+    mock.shutdown()
+
+    report = {
+        "params": params,
+        "env": {"python": platform.python_version(), "platform": platform.platform(), "revision": git_revision(),
+                "db_build_seconds": round(build_seconds, 3)},
+        "results": results,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+生成可复现的合成 SQLite 数据库，用于基准测试
+相同的 (表数, 列数, 行数, 种子) 总是生成完全相同的库，生成一次后复用
+"""
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'xiyan_mcp_server'))
+
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer, MetaData, String, Table
+
+from config.db_config import DBConfig
+from utils.db_util import init_db_conn
+
+WORDS = ['customer', 'order', 'product', 'dealer', 'region', 'invoice', 'payment', 'shipment', 'supplier',
+         'employee', 'store', 'campaign', 'contract', 'vehicle', 'warehouse', 'category', 'review', 'coupon']
+COLUMN_WORDS = ['name', 'amount', 'price', 'status', 'city', 'level', 'score', 'quantity', 'discount', 'channel',
+                'brand', 'model', 'color', 'rating', 'created', 'updated', 'remark', 'code', 'weight', 'tax']
+COLUMN_TYPES = [Integer, Float, String(64), Date]
+
+
+def table_names(num_tables: int) -> list:
+    return [f"{WORDS[i % len(WORDS)]}_{i}" for i in range(num_tables)]
+
+
+def db_file_name(num_tables: int, num_columns: int, num_rows: int, seed: int) -> str:
+    return f"synthetic_t{num_tables}_c{num_columns}_r{num_rows}_s{seed}.sqlite"
+
+
+def _value(rng: random.Random, column_type):
+    if column_type is Integer:
+        return rng.randint(0, 10000)
+    if column_type is Float:
+        return round(rng.uniform(0, 10000), 2)
+    if column_type is Date:
+        return datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randint(0, 1500))
+    return f"{rng.choice(COLUMN_WORDS)}_{rng.randint(0, 50)}"
+
+
+def build_synthetic_db(output_dir: str, num_tables: int = 50, num_columns: int = 12, num_rows: int = 1000,
+                       seed: int = 0, force: bool = False) -> DBConfig:
+    """
+    在 output_dir 下生成合成库并返回对应的 DBConfig
+    每张表有自增主键，除第一张表外都带一个指向前一张表的外键，其余列按种子随机选择类型
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    db_path = os.path.join(output_dir, db_file_name(num_tables, num_columns, num_rows, seed))
+    db_config = DBConfig(dialect='sqlite', db_path=db_path)
+    if os.path.exists(db_path) and not force:
+        return db_config
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    open(tmp_path, 'wb').close()
+
+    rng = random.Random(seed)
+    engine = init_db_conn(DBConfig(dialect='sqlite', db_path=tmp_path))
+    metadata = MetaData()
+    tables = []
+    names = table_names(num_tables)
+    for idx, name in enumerate(names):
+        columns = [Column('id', Integer, primary_key=True)]
+        if idx > 0:
+            columns.append(Column(f'{names[idx - 1]}_id', Integer, ForeignKey(f'{names[idx - 1]}.id')))
+        while len(columns) < num_columns:
+            col_name = f"{rng.choice(COLUMN_WORDS)}_{len(columns)}"
+            columns.append(Column(col_name, rng.choice(COLUMN_TYPES)))
+        tables.append(Table(name, metadata, *columns))
+    metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        for table in tables:
+            rows = []
+            for row_idx in range(num_rows):
+                row = {}
+                for col in table.columns:
+                    if col.name == 'id':
+                        row['id'] = row_idx + 1
+                    elif col.foreign_keys:
+                        row[col.name] = rng.randint(1, num_rows)
+                    else:
+                        row[col.name] = _value(rng, type(col.type))
+                rows.append(row)
+            if rows:
+                connection.execute(table.insert(), rows)
+    engine.dispose()
+    os.replace(tmp_path, db_path)
+    return db_config
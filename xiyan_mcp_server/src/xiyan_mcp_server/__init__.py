@@ -3,7 +3,7 @@ from server import *
 
 def main():
    """Main entry point for the package."""
-   mcp.run()
+   serve()
 
 # Expose important items at package level
 __all__ = ['main', 'server']
\ No newline at end of file
@@ -1,3 +1,4 @@
+import os
 from dataclasses import dataclass, field
 from typing import Optional
 
@@ -11,6 +12,16 @@ class DBConfig:
     db_pwd: Optional[str] = None  # MySQL/PostgreSQL 通用
     db_host: Optional[str] = None  # MySQL/PostgreSQL 通用
     port: Optional[int] = None  # MySQL/PostgreSQL 通用
+    pool_size: int = 5  # 连接池常驻连接数
+    max_overflow: int = 10  # 连接池允许临时超出的连接数
+    pool_recycle: int = 3600  # 连接最长复用时间（秒），避免被服务端 wait_timeout 断开
+    pool_pre_ping: bool = True  # 取出连接前先探活
+    statement_timeout: Optional[float] = None  # 生成 SQL 的语句超时（秒），None 表示不限制
+    max_estimated_rows: Optional[float] = None  # EXPLAIN 估算行数上限，超过则拒绝执行
+    max_estimated_cost: Optional[float] = None  # EXPLAIN 估算代价上限（MySQL query_cost / PostgreSQL Total Cost）
+    sample_time_budget: Optional[float] = 2.0  # 单表示例值采样的耗时上限（秒），None 表示不限制
+    max_sample_table_rows: Optional[int] = None  # 估算行数超过该值的大表不采样示例值
+    sample_high_cardinality_ratio: Optional[float] = None  # 采样行中不同值占比不低于该值的列（ID、自由文本等）不保留示例
 
     def __post_init__(self):
         if self.dialect == 'sqlite':
@@ -22,4 +33,10 @@ class DBConfig:
             self.db_host = self.db_host or 'localhost'
             self.port = self.port or (3306 if self.dialect == 'mysql' else 5432)
         else:
-            raise ValueError(f"Unsupported database dialect: {self.dialect}")
\ No newline at end of file
+            raise ValueError(f"Unsupported database dialect: {self.dialect}")
+
+    def cache_key(self) -> tuple:
+        """用于共享缓存（schema、连接池等）的配置标识，不包含密码"""
+        if self.dialect == 'sqlite':
+            return (self.dialect, os.path.abspath(self.db_path))
+        return (self.dialect, self.db_host, self.port, self.db_name, self.user_name)
@@ -0,0 +1,84 @@
+import dataclasses
+import os
+import threading
+from typing import Dict, List, Optional
+
+from config.db_config import DBConfig
+from utils.file_util import read_json_file
+
+_DB_CONFIG_FIELDS = {f.name for f in dataclasses.fields(DBConfig)}
+
+
+class DBRegistry:
+    """
+    按名称管理多个数据库配置，一个进程服务多个库
+    每个 DBConfig 的 cache_key 不同，因而各自拥有独立的连接池和 M-Schema 缓存
+    """
+    def __init__(self, default: Optional[str] = None):
+        self._configs: Dict[str, DBConfig] = {}
+        self._default = default
+        self._lock = threading.Lock()
+
+    def register(self, name: str, db_config: DBConfig):
+        with self._lock:
+            self._configs[name] = db_config
+            if self._default is None:
+                self._default = name
+
+    def get(self, name: Optional[str] = None) -> DBConfig:
+        """name 为空时返回默认库"""
+        name = name or self._default
+        with self._lock:
+            db_config = self._configs.get(name)
+        if db_config is None:
+            raise KeyError(f"Unknown database '{name}', available databases: {', '.join(self.names())}")
+        return db_config
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._configs.keys())
+
+    @property
+    def default(self) -> Optional[str]:
+        return self._default
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._configs
+
+    def __len__(self) -> int:
+        return len(self._configs)
+
+
+def db_config_from_dict(entry: dict, defaults: Optional[dict] = None) -> DBConfig:
+    """由配置项创建 DBConfig，字符串中的 ${ENV} 会被替换为环境变量，便于不在文件中写明密码"""
+    values = dict(defaults or {})
+    for key, value in entry.items():
+        if key not in _DB_CONFIG_FIELDS:
+            raise ValueError(f"Unknown database config field '{key}'")
+        values[key] = os.path.expandvars(value) if isinstance(value, str) else value
+    return DBConfig(**values)
+
+
+def load_db_registry(path: str, defaults: Optional[dict] = None) -> DBRegistry:
+    """
+    从 JSON 文件加载数据库注册表，格式为：
+    {
+        "default": "sales",
+        "databases": {
+            "sales": {"dialect": "mysql", "db_name": "sales", "user_name": "reader", "db_pwd": "${SALES_PWD}", "db_host": "10.0.0.1"},
+            "local": {"dialect": "sqlite", "db_path": "/data/local.sqlite", "statement_timeout": 10}
+        }
+    }
+    defaults: 各项未设置的字段使用的默认值（如连接池大小、语句超时）
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Database config file not found: {path}")
+    data = read_json_file(path)
+    if not isinstance(data, dict) or not data.get('databases'):
+        raise ValueError(f"No databases configured in {path}")
+    registry = DBRegistry(default=data.get('default'))
+    for name, entry in data['databases'].items():
+        registry.register(name, db_config_from_dict(entry, defaults))
+    if registry.default not in registry:
+        raise ValueError(f"Default database '{registry.default}' is not configured in {path}")
+    return registry
@@ -1,9 +1,30 @@
 from datasource.db_source import HITLSQLDatabase
+from datasource.schema_linker import get_schema_linker
+from utils.question_cache import schema_hash
 
 class DataBaseEnv:
-    def __init__(self, database: HITLSQLDatabase):
+    def __init__(self, database: HITLSQLDatabase, link_top_k: int = 0, link_min_tables: int = 20, embed_fn=None,
+                 render_seed=None):
         self.database = database
         self.dialect = database.dialect
         self.mschema = database.mschema
         self.db_name = database.db_name
-        self.mschema_str = self.mschema.to_mschema()
\ No newline at end of file
+        # render_seed 不为 None 时表和字段按固定种子打乱，渲染结果被缓存且每次请求完全一致
+        self.render_seed = render_seed
+        self.mschema_str = self.mschema.to_mschema(seed=render_seed)
+        # 缓存使用固定顺序、不含示例值的渲染结果计算哈希，重新采样示例值不会让缓存失效
+        self.mschema_hash = schema_hash(self.mschema.to_mschema(example_num=0, shuffle=False))
+        # schema linking：表数量不少于 link_min_tables 时，只把与问题相关的 link_top_k 张表放进 prompt
+        self.link_top_k = link_top_k
+        self.link_min_tables = link_min_tables
+        self.embed_fn = embed_fn
+
+    def get_mschema_str(self, question: str) -> str:
+        """返回用于该问题 prompt 的 schema，未开启或没有命中任何表时使用完整 schema"""
+        if self.link_top_k <= 0 or len(self.mschema.tables) < self.link_min_tables:
+            return self.mschema_str
+        linker = get_schema_linker(self.mschema, self.embed_fn)
+        selected_tables = linker.link(question, top_k=self.link_top_k)
+        if not selected_tables:
+            return self.mschema_str
+        return self.mschema.to_mschema(selected_tables=selected_tables, seed=self.render_seed)
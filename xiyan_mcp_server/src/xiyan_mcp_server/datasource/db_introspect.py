@@ -0,0 +1,206 @@
+import hashlib
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, Inspector
+
+
+def new_table_catalog(comment: str = '', row_count: Optional[int] = None) -> Dict:
+    return {"comment": comment, "columns": [], "pks": [], "fks": [], "row_count": row_count}
+
+
+def bulk_introspect(engine: Engine, inspector: Inspector, schema: Optional[str], table_names: List[str]) -> Dict[str, Dict]:
+    """
+    一次性获取整个 schema 的表注释、字段、主键和外键，避免逐表多次往返
+    返回 {table_name: {"comment": str, "columns": [...], "pks": [...], "fks": [...], "row_count": int}}，
+    columns/fks 的结构与 Inspector.get_columns/get_foreign_keys 保持一致，
+    row_count 为数据库统计信息中的估算行数，不支持时为 None
+    """
+    if not table_names:
+        return {}
+    if engine.dialect.name == 'mysql':
+        return introspect_mysql(engine, schema, table_names)
+    return introspect_multi(inspector, schema, table_names)
+
+
+def introspect_mysql(engine: Engine, schema: Optional[str], table_names: List[str]) -> Dict[str, Dict]:
+    """MySQL 直接查询 information_schema，整个库只需三次查询"""
+    wanted = set(table_names)
+    catalog = {}
+    params = {"schema": schema}
+    with engine.connect() as connection:
+        current_schema = connection.execute(text("SELECT COALESCE(:schema, DATABASE())"), params).scalar()
+        params = {"schema": current_schema}
+
+        rows = connection.execute(text(
+            "SELECT TABLE_NAME, TABLE_COMMENT, TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = :schema"), params)
+        for table_name, comment, row_count in rows:
+            if table_name in wanted:
+                catalog[table_name] = new_table_catalog(comment or '', row_count)
+
+        rows = connection.execute(text(
+            "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_DEFAULT, EXTRA, COLUMN_COMMENT "
+            "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = :schema "
+            "ORDER BY TABLE_NAME, ORDINAL_POSITION"), params)
+        for table_name, column_name, column_type, is_nullable, default, extra, comment in rows:
+            if table_name not in catalog:
+                continue
+            catalog[table_name]["columns"].append({
+                "name": column_name,
+                "type": mysql_column_type(column_type),
+                "nullable": is_nullable == 'YES',
+                "default": default,
+                "autoincrement": 'auto_increment' in (extra or '').lower(),
+                "comment": comment,
+            })
+
+        rows = connection.execute(text(
+            "SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_SCHEMA, "
+            "REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+            "FROM information_schema.KEY_COLUMN_USAGE WHERE TABLE_SCHEMA = :schema "
+            "AND (CONSTRAINT_NAME = 'PRIMARY' OR REFERENCED_TABLE_NAME IS NOT NULL) "
+            "ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION"), params)
+        fks = {}
+        for table_name, constraint_name, column_name, ref_schema, ref_table, ref_column in rows:
+            if table_name not in catalog:
+                continue
+            if constraint_name == 'PRIMARY':
+                catalog[table_name]["pks"].append(column_name)
+                continue
+            fk = fks.get((table_name, constraint_name))
+            if fk is None:
+                # 与 SQLAlchemy 保持一致：引用当前库时 referred_schema 与传入的 schema 相同
+                fk = {
+                    "name": constraint_name,
+                    "constrained_columns": [],
+                    "referred_schema": schema if ref_schema == current_schema else ref_schema,
+                    "referred_table": ref_table,
+                    "referred_columns": [],
+                }
+                fks[(table_name, constraint_name)] = fk
+                catalog[table_name]["fks"].append(fk)
+            fk["constrained_columns"].append(column_name)
+            fk["referred_columns"].append(ref_column)
+    return catalog
+
+
+def mysql_column_type(column_type: str) -> str:
+    """int(11) unsigned -> INT(11) UNSIGNED，括号内的取值（如 enum 的枚举值）保持原样"""
+    if '(' not in column_type:
+        return column_type.upper()
+    name, rest = column_type.split('(', 1)
+    args, _, suffix = rest.rpartition(')')
+    return f"{name.upper()}({args}){suffix.upper()}"
+
+
+def introspect_multi(inspector: Inspector, schema: Optional[str], table_names: List[str]) -> Dict[str, Dict]:
+    """
+    使用 SQLAlchemy 2.0 的批量反射接口（PostgreSQL 等方言会合并为少量 pg_catalog 查询）
+    老版本 SQLAlchemy 不支持时退化为逐表反射
+    """
+    if not hasattr(inspector, 'get_multi_columns'):
+        return introspect_per_table(inspector, schema, table_names)
+
+    catalog = {table_name: new_table_catalog() for table_name in table_names}
+    kw = {"schema": schema, "filter_names": table_names}
+    try:
+        comments = inspector.get_multi_table_comment(**kw)
+    except NotImplementedError:  # sqlite不支持添加注释
+        comments = {}
+    for (_, table_name), comment in comments.items():
+        if table_name in catalog:
+            catalog[table_name]["comment"] = comment.get('text') or ''
+    for (_, table_name), columns in inspector.get_multi_columns(**kw).items():
+        if table_name in catalog:
+            catalog[table_name]["columns"] = columns
+    for (_, table_name), pk in inspector.get_multi_pk_constraint(**kw).items():
+        if table_name in catalog:
+            catalog[table_name]["pks"] = pk.get('constrained_columns') or []
+    for (_, table_name), fks in inspector.get_multi_foreign_keys(**kw).items():
+        if table_name in catalog:
+            catalog[table_name]["fks"] = fks
+    if inspector.bind.dialect.name == 'postgresql':
+        for table_name, row_count in estimate_pg_row_counts(inspector.bind, schema).items():
+            if table_name in catalog:
+                catalog[table_name]["row_count"] = row_count
+    return catalog
+
+
+def estimate_pg_row_counts(engine: Engine, schema: Optional[str]) -> Dict[str, int]:
+    """pg_class.reltuples 为 ANALYZE 后的估算行数，从未 ANALYZE 过的表为 -1 或 0"""
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT c.relname, c.reltuples FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = COALESCE(:schema, current_schema()) AND c.relkind IN ('r', 'p', 'm')"),
+            {"schema": schema})
+        return {table_name: int(row_count) for table_name, row_count in rows if row_count is not None and row_count >= 0}
+
+
+def introspect_per_table(inspector: Inspector, schema: Optional[str], table_names: List[str]) -> Dict[str, Dict]:
+    catalog = {}
+    for table_name in table_names:
+        try:
+            comment = inspector.get_table_comment(table_name, schema)['text']
+        except:    # sqlite不支持添加注释
+            comment = ''
+        table_catalog = new_table_catalog(comment or '')
+        table_catalog["columns"] = inspector.get_columns(table_name, schema=schema)
+        table_catalog["pks"] = inspector.get_pk_constraint(table_name, schema)['constrained_columns']
+        table_catalog["fks"] = inspector.get_foreign_keys(table_name, schema)
+        catalog[table_name] = table_catalog
+    return catalog
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1('\x1f'.join('' if p is None else str(p) for p in parts).encode('utf-8')).hexdigest()[:16]
+
+
+def table_fingerprints(engine: Engine, schema: Optional[str] = None, include_update_time: bool = False) -> Dict[str, str]:
+    """
+    返回 {table_name: 指纹}，表结构（字段、主键、外键、注释）变化时指纹随之变化，用于增量刷新 M-Schema
+    mysql: information_schema 中的 CREATE_TIME、表注释、字段和外键的校验和；
+           UPDATE_TIME 会随数据写入变化，只有 include_update_time=True 时才计入（此时数据变化也会触发重新采样示例值）
+    postgresql: pg_class oid、pg_attribute 字段列表、约束定义和注释的 md5
+    sqlite: sqlite_master 中的建表语句
+    不支持的方言返回 None
+    """
+    dialect = engine.dialect.name
+    with engine.connect() as connection:
+        if dialect == 'sqlite':
+            rows = connection.execute(text(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"))
+            return {name: _digest(sql) for name, sql in rows}
+        if dialect == 'mysql':
+            params = {"schema": schema}
+            columns = dict(connection.execute(text(
+                "SELECT TABLE_NAME, CONCAT(COUNT(*), ':', SUM(CRC32(CONCAT_WS(':', ORDINAL_POSITION, COLUMN_NAME, "
+                "COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY, EXTRA, COLUMN_COMMENT, COALESCE(COLUMN_DEFAULT, 'NULL'))))) "
+                "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE()) "
+                "GROUP BY TABLE_NAME"), params).all())
+            keys = dict(connection.execute(text(
+                "SELECT TABLE_NAME, CONCAT(COUNT(*), ':', SUM(CRC32(CONCAT_WS(':', CONSTRAINT_NAME, COLUMN_NAME, "
+                "ORDINAL_POSITION, REFERENCED_TABLE_SCHEMA, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME)))) "
+                "FROM information_schema.KEY_COLUMN_USAGE WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE()) "
+                "GROUP BY TABLE_NAME"), params).all())
+            rows = connection.execute(text(
+                "SELECT TABLE_NAME, CREATE_TIME, UPDATE_TIME, TABLE_COMMENT FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE()) AND TABLE_TYPE = 'BASE TABLE'"), params)
+            return {name: _digest(create_time, update_time if include_update_time else None, comment,
+                                  columns.get(name), keys.get(name))
+                    for name, create_time, update_time, comment in rows}
+        if dialect == 'postgresql':
+            rows = connection.execute(text(
+                "SELECT c.relname, c.oid, obj_description(c.oid, 'pg_class'), "
+                "(SELECT md5(string_agg(a.attnum || ':' || a.attname || ':' || format_type(a.atttypid, a.atttypmod) "
+                "        || ':' || a.attnotnull || ':' || COALESCE(col_description(c.oid, a.attnum), ''), ',' "
+                "        ORDER BY a.attnum)) "
+                "   FROM pg_attribute a WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped), "
+                "(SELECT md5(string_agg(pg_get_constraintdef(k.oid), ',' ORDER BY k.conname)) "
+                "   FROM pg_constraint k WHERE k.conrelid = c.oid AND k.contype IN ('p', 'f')) "
+                "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = COALESCE(:schema, current_schema()) AND c.relkind IN ('r', 'p')"),
+                {"schema": schema})
+            return {name: _digest(oid, comment, columns, constraints) for name, oid, comment, columns, constraints in rows}
+    return None
@@ -1,5 +1,10 @@
 import random
+import threading
+import time
+from contextlib import contextmanager
 from utils.file_util import read_json_file, write_json_to_file, save_raw_text
+from utils.cache_util import TTLCache
+from datasource.mschema_records import ExamplePool, FieldRecord, TableRecord, intern_str
 from utils.db_util import examples_to_str
 from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
@@ -8,27 +13,91 @@ class MSchema:
     def __init__(self, db_id: str = 'Anonymous', schema: Optional[str] = None):
         self.db_id = db_id
         self.schema = schema
+        # 表名 -> TableRecord，字段为 FieldRecord，读取方式与原先的嵌套 dict 相同
         self.tables = {}
         self.foreign_keys = []
+        self._example_pool = ExamplePool()
+        # 渲染结果缓存，schema 有任何修改时通过 invalidate 清空
+        self.version = 0
+        self._render_cache = TTLCache(max_size=256)
+        self._field_line_cache = {}
+        # 增量刷新：每张表的结构指纹、上次检查时间，同一时间只允许一次刷新
+        self.fingerprints = {}
+        self.refreshed_at = time.time()
+        self.refresh_lock = threading.Lock()
+        # batch_update 嵌套层数，以及批量期间是否有未清空的修改
+        self._batch_depth = 0
+        self._batch_dirty = False
+
+    def invalidate(self):
+        """直接修改 tables/foreign_keys 后需要调用，清空渲染缓存"""
+        self.version += 1
+        self._render_cache.clear()
+        self._field_line_cache = {}
+
+    def _changed(self):
+        """add_table/add_field/add_foreign_key 修改后调用，batch_update 期间推迟到批量结束时统一 invalidate"""
+        if self._batch_depth:
+            self._batch_dirty = True
+        else:
+            self.invalidate()
+
+    @contextmanager
+    def batch_update(self):
+        """
+        批量添加表、字段和外键，期间不逐个清空渲染缓存，退出时只 invalidate 一次
+        用于构建尚未对外使用的 MSchema（初始化、增量刷新的 staging），批量期间的渲染结果不保证是最新的
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._batch_dirty:
+                self._batch_dirty = False
+                self.invalidate()
 
     def add_table(self, name, fields={}, comment=None):
-        self.tables[name] = {"fields": fields.copy(), 'examples': [], 'comment': comment}
+        fields = {intern_str(field_name): field if isinstance(field, FieldRecord)
+                  else FieldRecord.from_dict(field, self._example_pool) for field_name, field in fields.items()}
+        self.tables[intern_str(name)] = TableRecord(fields, comment)
+        self._changed()
 
     def add_field(self, table_name: str, field_name: str, field_type: str = "",
             primary_key: bool = False, nullable: bool = True, default: Any = None,
             autoincrement: bool = False, comment: str = "", examples: list = [], **kwargs):
-        self.tables[table_name]["fields"][field_name] = {
-            "type": field_type,
-            "primary_key": primary_key,
-            "nullable": nullable,
-            "default": default if default is None else f'{default}',
-            "autoincrement": autoincrement,
-            "comment": comment,
-            "examples": examples.copy(),
-            **kwargs}
+        self.tables[table_name].fields[intern_str(field_name)] = FieldRecord(
+            type=field_type,
+            primary_key=primary_key,
+            nullable=nullable,
+            default=default if default is None else f'{default}',
+            autoincrement=autoincrement,
+            comment=comment,
+            examples=self._example_pool.get(examples),
+            extra=kwargs)
+        self._changed()
 
     def add_foreign_key(self, table_name, field_name, ref_schema, ref_table_name, ref_field_name):
-        self.foreign_keys.append([table_name, field_name, ref_schema, ref_table_name, ref_field_name])
+        self.foreign_keys.append([intern_str(v) for v in (table_name, field_name, ref_schema, ref_table_name, ref_field_name)])
+        self._changed()
+
+    def replace_tables(self, source: 'MSchema', table_names: Iterable[str], dropped: Iterable[str] = ()):
+        """
+        用 source 中的表替换或新增 table_names，并删除 dropped 中的表，外键一并更新
+        tables/foreign_keys 整体替换为新对象而不是原地修改，正在渲染的请求继续使用开始时取到的快照；
+        替换前后各 invalidate 一次，渲染期间版本号变化时结果不会写入缓存
+        """
+        table_names = list(table_names)
+        changed = set(table_names) | set(dropped)
+        tables = {name: info for name, info in self.tables.items() if name not in changed}
+        for name in table_names:
+            tables[name] = source.tables[name]
+        foreign_keys = [fk for fk in self.foreign_keys if fk[0] not in changed]
+        foreign_keys += [fk for fk in source.foreign_keys if fk[0] in table_names]
+        self.invalidate()
+        self.tables = dict(sorted(tables.items()))
+        self.foreign_keys = sorted(foreign_keys, key=lambda fk: fk[0])
+        self.invalidate()
 
     def get_field_type(self, field_type, simple_mode=True)->str:
         if not simple_mode:
@@ -57,9 +126,65 @@ class MSchema:
         except:
             return {}
 
+    def field_mschema(self, table_name: str, field_name: str, example_num=3, show_type_detail=False,
+                      tables: Optional[Dict] = None, line_cache: Optional[Dict] = None) -> str:
+        """
+        单个字段的 M-Schema 描述，结果会被缓存
+        tables/line_cache: 渲染开始时取到的表和字段行缓存，保证一次渲染只读同一份快照
+        """
+        tables = self.tables if tables is None else tables
+        line_cache = self._field_line_cache if line_cache is None else line_cache
+        cache_key = (table_name, field_name, example_num, show_type_detail)
+        field_line = line_cache.get(cache_key)
+        if field_line is not None:
+            return field_line
+
+        field_info = tables[table_name]['fields'][field_name]
+        raw_type = self.get_field_type(field_info['type'], not show_type_detail)
+        field_line = f"({field_name}:{raw_type.upper()}"
+        if field_info['comment'] != '':
+            field_line += f", {field_info['comment'].strip()}"
+        else:
+            pass
+
+        ## 打上主键标识
+        is_primary_key = field_info.get('primary_key', False)
+        if is_primary_key:
+            field_line += f", Primary Key"
+
+        # 如果有示例，添加上
+        if len(field_info.get('examples', [])) > 0 and example_num > 0:
+            examples = field_info['examples']
+            examples = [s for s in examples if s is not None]
+            examples = examples_to_str(examples)
+            if len(examples) > example_num:
+                examples = examples[:example_num]
+
+            if raw_type in ['DATE', 'TIME', 'DATETIME', 'TIMESTAMP']:
+                examples = [examples[0]]
+            elif len(examples) > 0 and max([len(s) for s in examples]) > 20:
+                if max([len(s) for s in examples]) > 50:
+                    examples = []
+                else:
+                    examples = [examples[0]]
+            else:
+                pass
+            if len(examples) > 0:
+                example_str = ', '.join([str(example) for example in examples])
+                field_line += f", Examples: [{example_str}]"
+            else:
+                pass
+        else:
+            field_line += ""
+        field_line += ")"
+
+        line_cache[cache_key] = field_line
+        return field_line
+
     def single_table_mschema(self, table_name: str, selected_columns: List = None,
-                             example_num=3, show_type_detail=False, shuffle=True) -> str:
-        table_info = self.tables.get(table_name, {})
+                             example_num=3, show_type_detail=False, shuffle=True, seed: Optional[int] = None,
+                             tables: Optional[Dict] = None, line_cache: Optional[Dict] = None) -> str:
+        table_info = (self.tables if tables is None else tables).get(table_name, {})
         output = []
         table_comment = table_info.get('comment', '')
         if table_comment is not None and table_comment != 'None' and len(table_comment) > 0:
@@ -75,52 +200,16 @@ class MSchema:
 
         field_lines = []
         # 处理表中的每一个字段
-        for field_name, field_info in table_info['fields'].items():
+        for field_name, field_info in table_info.get('fields', {}).items():
             if selected_columns is not None and field_name.lower() not in selected_columns:
                 continue
-
-            raw_type = self.get_field_type(field_info['type'], not show_type_detail)
-            field_line = f"({field_name}:{raw_type.upper()}"
-            if field_info['comment'] != '':
-                field_line += f", {field_info['comment'].strip()}"
-            else:
-                pass
-
-            ## 打上主键标识
-            is_primary_key = field_info.get('primary_key', False)
-            if is_primary_key:
-                field_line += f", Primary Key"
-
-            # 如果有示例，添加上
-            if len(field_info.get('examples', [])) > 0 and example_num > 0:
-                examples = field_info['examples']
-                examples = [s for s in examples if s is not None]
-                examples = examples_to_str(examples)
-                if len(examples) > example_num:
-                    examples = examples[:example_num]
-
-                if raw_type in ['DATE', 'TIME', 'DATETIME', 'TIMESTAMP']:
-                    examples = [examples[0]]
-                elif len(examples) > 0 and max([len(s) for s in examples]) > 20:
-                    if max([len(s) for s in examples]) > 50:
-                        examples = []
-                    else:
-                        examples = [examples[0]]
-                else:
-                    pass
-                if len(examples) > 0:
-                    example_str = ', '.join([str(example) for example in examples])
-                    field_line += f", Examples: [{example_str}]"
-                else:
-                    pass
-            else:
-                field_line += ""
-            field_line += ")"
-
-            field_lines.append(field_line)
+            field_lines.append(self.field_mschema(table_name, field_name, example_num, show_type_detail,
+                                                  {table_name: table_info}, line_cache))
 
         if shuffle:
-            random.shuffle(field_lines)
+            # 指定 seed 时按表名派生固定的打乱顺序，保证多次渲染结果一致
+            rng = random if seed is None else random.Random(f"{seed}:{table_name}")
+            rng.shuffle(field_lines)
 
         output.append('[')
         output.append(',\n'.join(field_lines))
@@ -129,22 +218,42 @@ class MSchema:
         return '\n'.join(output)
 
     def to_mschema(self, selected_tables: List = None, selected_columns: List = None,
-                   example_num=3, show_type_detail=False, shuffle=True) -> str:
+                   example_num=3, show_type_detail=False, shuffle=True, seed: Optional[int] = None) -> str:
         """
         convert to a MSchema string.
         selected_tables: 默认为None，表示选择所有的表
         selected_columns: 默认为None，表示所有列全选，格式['table_name.column_name']
+        shuffle: 是否随机打乱表和字段的顺序
+        seed: 打乱顺序使用的随机种子，指定后输出是确定的，相同参数的渲染结果会被缓存，
+              可以让 prompt 中的 schema 前缀在多次请求间保持字节级一致，命中模型服务的前缀缓存
         """
-        output = []
-
         if selected_tables is not None:
             selected_tables = [s.lower() for s in selected_tables]
         if selected_columns is not None:
             selected_columns = [s.lower() for s in selected_columns]
             selected_tables = [s.split('.')[0].lower() for s in selected_columns]
 
+        # 先取版本号和字段行缓存，再取表：增量刷新在替换前后都会 invalidate，
+        # 这样取到的表和字段行缓存总是一致的，刷新只影响缓存写入，不会让本次渲染读到一半新一半旧的数据
+        version = self.version
+        line_cache = self._field_line_cache
+        tables = self.tables
+        foreign_keys = self.foreign_keys
+
+        deterministic = not shuffle or seed is not None
+        cache_key = None
+        if deterministic:
+            # 缓存键带上版本号，刷新后旧版本的渲染结果不会再被命中
+            cache_key = (version, None if selected_tables is None else tuple(sorted(set(selected_tables))),
+                         None if selected_columns is None else tuple(sorted(set(selected_columns))),
+                         example_num, show_type_detail, shuffle, seed)
+            cached = self._render_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        output = []
         # 依次处理每一个表
-        for table_name, table_info in self.tables.items():
+        for table_name, table_info in tables.items():
             if selected_tables is None or table_name.lower() in selected_tables:
                 cur_table_type = table_info.get('type', 'table')
                 column_names = list(table_info['fields'].keys())
@@ -152,18 +261,22 @@ class MSchema:
                     cur_selected_columns = [c for c in column_names if f"{table_name}.{c}".lower() in selected_columns]
                 else:
                     cur_selected_columns = selected_columns
-                output.append(self.single_table_mschema(table_name, cur_selected_columns, example_num, show_type_detail, shuffle))
+                output.append(self.single_table_mschema(table_name, cur_selected_columns, example_num, show_type_detail,
+                                                        shuffle, seed, tables, line_cache))
 
         if shuffle:
-            random.shuffle(output)
+            if seed is None:
+                random.shuffle(output)
+            else:
+                random.Random(seed).shuffle(output)
 
         output.insert(0, f"【DB_ID】 {self.db_id}")
         output.insert(1, f"【Schema】")
 
         # 添加外键信息，选择table_type为view时不展示外键
-        if self.foreign_keys:
+        if foreign_keys:
             output.append("【Foreign keys】")
-            for fk in self.foreign_keys:
+            for fk in foreign_keys:
                 ref_schema = fk[2]
                 table1, column1, _, table2, column2 = fk
                 if selected_tables is None or \
@@ -171,13 +284,17 @@ class MSchema:
                     if ref_schema == self.schema:
                         output.append(f"{fk[0]}.{fk[1]}={fk[3]}.{fk[4]}")
 
-        return '\n'.join(output)
+        mschema_str = '\n'.join(output)
+        # 渲染期间发生了刷新时不写缓存，避免旧结果在失效之后又被缓存
+        if cache_key is not None and self.version == version:
+            self._render_cache.set(cache_key, mschema_str)
+        return mschema_str
 
     def dump(self):
         schema_dict = {
             "db_id": self.db_id,
             "schema": self.schema,
-            "tables": self.tables,
+            "tables": {name: table.to_dict() for name, table in self.tables.items()},
             "foreign_keys": self.foreign_keys
         }
         return schema_dict
@@ -190,5 +307,17 @@ class MSchema:
         data = read_json_file(file_path)
         self.db_id = data.get("db_id", "Anonymous")
         self.schema = data.get("schema", None)
-        self.tables = data.get("tables", {})
-        self.foreign_keys = data.get("foreign_keys", [])
+        self._example_pool = ExamplePool()
+        self.tables = {intern_str(name): TableRecord.from_dict(table, self._example_pool)
+                       for name, table in data.get("tables", {}).items()}
+        self.foreign_keys = [[intern_str(v) for v in fk] for fk in data.get("foreign_keys", [])]
+        self.invalidate()
+
+    def save_snapshot(self, file_path: str):
+        """保存为二进制快照（含表结构指纹），重启时加载比 JSON 和重新内省快得多"""
+        from datasource.mschema_snapshot import save_snapshot
+        save_snapshot(self, file_path)
+
+    def load_snapshot(self, file_path: str):
+        from datasource.mschema_snapshot import load_snapshot
+        load_snapshot(file_path, self)
@@ -1,11 +1,50 @@
-from typing import Any, Dict, List, Optional, Tuple
+import base64
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from llama_index.core import SQLDatabase
-from sqlalchemy import MetaData, Table, select, text
+from sqlalchemy import MetaData, Table, column, func, inspect, select, table, text, tuple_
 from sqlalchemy.engine import Engine
 
+from datasource.db_introspect import bulk_introspect, new_table_catalog, table_fingerprints
 from datasource.db_mschema import MSchema
+from datasource.sql_database import SQLDatabase
 from utils.db_util import examples_to_str, preprocess_sql_query
+from utils.query_guard import QueryCanceller, check_query_cost, statement_timeout
+from utils.result_cache import ResultCache
+from utils.sql_util import extract_table_names, is_select_statement, normalize_sql, strip_statement, tokens_to_sql
+from utils.sql_validator import validate_sql
+from utils.trace_util import inc
+
+
+def _encode_cursor(state: Dict) -> str:
+    """分页游标：JSON 后 base64url 编码，可直接放在资源 URI 的路径中"""
+    data = json.dumps(state, ensure_ascii=False, default=str, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> Dict:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except Exception:
+        raise ValueError(f"Invalid page cursor: {cursor}")
+    if not isinstance(state, dict) or not ('after' in state or 'offset' in state):
+        raise ValueError(f"Invalid page cursor: {cursor}")
+    return state
+
+
+def _is_binary_type(field_type: str) -> bool:
+    field_type = field_type.upper()
+    return 'BLOB' in field_type or 'BINARY' in field_type or 'BYTEA' in field_type
+
+
+def _is_long_text_type(field_type: str) -> bool:
+    field_type = field_type.upper()
+    return 'TEXT' in field_type or 'CLOB' in field_type
+
+
+# 判断高基数列所需的最少非空采样值个数
+MIN_CARDINALITY_SAMPLE = 20
 
 
 class HITLSQLDatabase(SQLDatabase):
@@ -13,16 +52,42 @@ class HITLSQLDatabase(SQLDatabase):
                  ignore_tables: Optional[List[str]] = None, include_tables: Optional[List[str]] = None,
                  sample_rows_in_table_info: int = 3, indexes_in_table_info: bool = False,
                  custom_table_info: Optional[dict] = None, view_support: bool = False, max_string_length: int = 300,
-                 mschema: Optional[MSchema] = None, db_name: Optional[str] = ''):
+                 mschema: Optional[MSchema] = None, db_name: Optional[str] = '',
+                 sample_examples: bool = True, sample_rows: int = 100, sample_time_budget: Optional[float] = 2.0,
+                 max_sample_table_rows: Optional[int] = None, stream_results: bool = True, fetch_batch_size: int = 100,
+                 result_cache: Optional[ResultCache] = None, statement_timeout: Optional[float] = None,
+                 max_estimated_rows: Optional[float] = None, max_estimated_cost: Optional[float] = None,
+                 sample_high_cardinality_ratio: Optional[float] = None):
         super().__init__(engine, schema, metadata, ignore_tables, include_tables, sample_rows_in_table_info,
                          indexes_in_table_info, custom_table_info, view_support, max_string_length)
 
         self._db_name = db_name
-        self._usable_tables = [table_name for table_name in self._usable_tables if self._inspector.has_table(table_name, schema)]
+        # 示例值采样：每张表一次查询，最多读取 sample_rows 行，单表耗时不超过 sample_time_budget 秒，
+        # 估算行数超过 max_sample_table_rows 的大表直接跳过
+        self._sample_examples = sample_examples
+        self._sample_rows = sample_rows
+        self._sample_time_budget = sample_time_budget
+        self._max_sample_table_rows = max_sample_table_rows
+        # 高基数列：采样窗口内几乎每行都是新值的列，其示例值对生成 SQL 没有帮助，设置后不保留
+        self._sample_high_cardinality_ratio = sample_high_cardinality_ratio
+        # 流式读取：使用服务端/非缓冲游标分批 fetchmany，到达行数上限即停止读取
+        self._stream_results = stream_results
+        self._fetch_batch_size = fetch_batch_size
+        # 查询结果缓存，按连接标识 + 归一化 SQL 共享
+        self._result_cache = result_cache
+        # 查询保护：语句超时（秒），以及基于 EXPLAIN 估算行数/代价的执行前拦截
+        self._statement_timeout = statement_timeout
+        self._max_estimated_rows = max_estimated_rows
+        self._max_estimated_cost = max_estimated_cost
+        self._conn_id = engine.url.render_as_string(hide_password=True)
         self._dialect = engine.dialect.name
         if mschema is not None:
+            # 复用已有的 M-Schema（如进程级缓存），不再逐表检查，避免额外的内省开销
+            self._usable_tables = [table_name for table_name in self._usable_tables if mschema.has_table(table_name)]
             self._mschema = mschema
         else:
+            # 表名本身来自 get_table_names，不再逐表 has_table 确认，避免 N 次目录查询
+            self._usable_tables = sorted(self._usable_tables)
             self._mschema = MSchema(db_id=db_name, schema=schema)
             self.init_mschema()
 
@@ -58,9 +123,8 @@ class HITLSQLDatabase(SQLDatabase):
         return self._inspector.get_unique_constraints(table_name, self._schema)
     
     def fectch_distinct_values(self, table_name: str, column_name: str, max_num: int = 5):
-        table = Table(table_name, self.metadata_obj, autoload_with=self._engine)
-        # 构建 SELECT DISTINCT 查询
-        query = select(table.c[column_name]).distinct().limit(max_num)
+        # 构建 SELECT DISTINCT 查询，使用轻量的 table/column 构造，无需反射整张表
+        query = select(column(column_name)).select_from(table(table_name, schema=self._schema)).distinct().limit(max_num)
         values = []
         with self._engine.connect() as connection:
             result = connection.execute(query)
@@ -70,33 +134,249 @@ class HITLSQLDatabase(SQLDatabase):
                     values.append(value[0])
         return values
     
-    def fetch(self, sql_query: str):
+    def fetch_table_examples(self, table_name: str, column_names: List[str], max_num: int = 5) -> Dict[str, List]:
+        """
+        一次查询为表中所有字段采样示例值：读取前 sample_rows 行，按字段去重，每个字段最多保留 max_num 个。
+        超过 sample_time_budget 时停止读取，返回已采到的示例。
+        设置了 sample_high_cardinality_ratio 时读完整个采样窗口统计每列的不同值占比，高基数列不返回示例
+        """
+        examples = {column_name: [] for column_name in column_names}
+        if not column_names:
+            return examples
+        ratio = self._sample_high_cardinality_ratio
+        # 每列非空值个数和不同值集合，只在需要判断高基数时统计
+        seen_counts = {column_name: 0 for column_name in column_names} if ratio is not None else None
+        seen_values = {column_name: set() for column_name in column_names} if ratio is not None else None
+        query = select(*[column(c) for c in column_names]).select_from(
+            table(table_name, schema=self._schema)).limit(self._sample_rows)
+        start = time.monotonic()
+        with self._engine.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(query)
+            try:
+                pending = set(column_names)
+                while pending or seen_counts is not None:
+                    rows = result.fetchmany(20)
+                    if not rows:
+                        break
+                    for row in rows:
+                        for column_name, value in zip(column_names, row):
+                            if seen_counts is not None and value is not None and value != '':
+                                seen_counts[column_name] += 1
+                                try:
+                                    seen_values[column_name].add(value)
+                                except TypeError:
+                                    seen_values[column_name].add(repr(value))
+                            values = examples[column_name]
+                            if column_name not in pending or value is None or value == '' or value in values:
+                                continue
+                            values.append(value)
+                            if len(values) >= max_num:
+                                pending.discard(column_name)
+                    if self._sample_time_budget is not None and time.monotonic() - start > self._sample_time_budget:
+                        break
+            finally:
+                result.close()
+        if seen_counts is not None:
+            for column_name, count in seen_counts.items():
+                # 少量行无法判断基数，至少看到 MIN_CARDINALITY_SAMPLE 个值才跳过
+                if count >= MIN_CARDINALITY_SAMPLE and len(seen_values[column_name]) / count >= ratio:
+                    examples[column_name] = []
+        return examples
+
+    def preview_table(self, table_name: str, columns: Optional[List[str]] = None, cursor: Optional[str] = None,
+                      limit: int = 100, max_cell_len: int = 100) -> Dict:
+        """
+        分页预览表数据，返回 {"columns", "rows", "next_cursor"}，没有下一页时 next_cursor 为 None
+        表名和字段名按 M-Schema 校验；按主键做 keyset 分页（WHERE pk > 上一页最后一行 ORDER BY pk），
+        翻到深处也只扫描一页的行；没有主键的表退回 OFFSET 分页
+        长文本列在数据库中先截取 max_cell_len 个字符，二进制列只返回字节数，宽表也不会传输整列内容
+        """
+        if not self._mschema.has_table(table_name):
+            raise ValueError(f"Unknown table '{table_name}'")
+        fields = self._mschema.tables[table_name]['fields']
+        columns = list(columns) if columns else list(fields.keys())
+        unknown = [c for c in columns if c not in fields]
+        if unknown:
+            raise ValueError(f"Unknown columns in table '{table_name}': {', '.join(unknown)}")
+        pk_columns = [name for name, field in fields.items() if field['primary_key']]
+        state = _decode_cursor(cursor) if cursor else {}
+
+        binary_columns = set()
+        selected = []
+        for name in columns:
+            field_type = fields[name]['type'] or ''
+            if name in pk_columns:
+                selected.append(column(name))
+            elif _is_binary_type(field_type):
+                binary_columns.add(name)
+                selected.append(func.length(column(name)).label(name))
+            elif _is_long_text_type(field_type):
+                selected.append(func.substr(column(name), 1, max_cell_len + 1).label(name))
+            else:
+                selected.append(column(name))
+        # 游标需要主键值，未选择的主键列额外查询但不返回
+        selected.extend(column(name) for name in pk_columns if name not in columns)
+
+        query = select(*selected).select_from(table(table_name, schema=self._schema))
+        if pk_columns:
+            after = state.get('after')
+            if after is not None:
+                if len(after) != len(pk_columns):
+                    raise ValueError(f"Invalid page cursor: {cursor}")
+                if len(pk_columns) == 1:
+                    query = query.where(column(pk_columns[0]) > after[0])
+                else:
+                    query = query.where(tuple_(*[column(c) for c in pk_columns]) > tuple_(*after))
+            query = query.order_by(*[column(c) for c in pk_columns])
+        else:
+            query = query.offset(int(state.get('offset', 0)))
+        # 多取一行判断是否还有下一页
+        query = query.limit(limit + 1)
+
+        with self._engine.connect() as connection, statement_timeout(connection, self._statement_timeout):
+            records = connection.execute(query).fetchall()
+        has_more = len(records) > limit
+        records = records[:limit]
+
+        next_cursor = None
+        if has_more:
+            if pk_columns:
+                last = records[-1]._mapping
+                next_cursor = _encode_cursor({"after": [last[c] for c in pk_columns]})
+            else:
+                next_cursor = _encode_cursor({"offset": int(state.get('offset', 0)) + limit})
+
+        rows = []
+        for record in records:
+            mapping = record._mapping
+            row = []
+            for name in columns:
+                value = mapping[name]
+                if value is None:
+                    row.append(None)
+                elif name in binary_columns:
+                    row.append(f"<{value} bytes>")
+                elif isinstance(value, (bytes, bytearray, memoryview)):
+                    row.append(f"<{len(value)} bytes>")
+                else:
+                    row.append(self.truncate_word(value if isinstance(value, str) else str(value),
+                                                  length=max_cell_len))
+            rows.append(row)
+        inc("xiyan_preview_rows_total", len(rows))
+        return {"columns": columns, "rows": rows, "next_cursor": next_cursor}
+
+    def should_sample_table(self, row_count: Optional[int]) -> bool:
+        if not self._sample_examples:
+            return False
+        if self._max_sample_table_rows is not None and row_count is not None:
+            return row_count <= self._max_sample_table_rows
+        return True
+
+    def _execute_and_fetch(self, connection, sql_query: str, max_rows: Optional[int] = None,
+                           canceller: Optional[QueryCanceller] = None) -> Tuple[List, List]:
+        """
+        执行 SQL 并读取至多 max_rows 行，返回 (records, columns)
+        开启 stream_results 时只从游标中读取需要的行，内存占用与结果集大小无关
+        执行受语句超时和代价上限保护，canceller 可以从其他线程中断查询
+        """
+        with statement_timeout(connection, self._statement_timeout, canceller):
+            if (self._max_estimated_rows is not None or self._max_estimated_cost is not None) \
+                    and is_select_statement(strip_statement(sql_query, self._dialect)):
+                check_query_cost(connection, sql_query, self._max_estimated_rows, self._max_estimated_cost)
+            if self._stream_results and max_rows:
+                connection = connection.execution_options(stream_results=True, max_row_buffer=max(max_rows, 1))
+            cursor = connection.execute(text(sql_query))
+            try:
+                if not cursor.returns_rows:
+                    return [], []
+                columns = list(cursor.keys())
+                if max_rows:
+                    records = []
+                    while len(records) < max_rows:
+                        rows = cursor.fetchmany(min(self._fetch_batch_size, max_rows - len(records)))
+                        if not rows:
+                            break
+                        records.extend(rows)
+                else:
+                    records = cursor.fetchall()
+            finally:
+                cursor.close()
+            return records, columns
+
+    def fetch_iter(self, sql_query: str, batch_size: Optional[int] = None) -> Iterator[Tuple]:
+        """流式遍历查询结果，每次从服务端游标读取 batch_size 行"""
+        sql_query = preprocess_sql_query(sql_query)
+        batch_size = batch_size or self._fetch_batch_size
+        with self._engine.connect() as connection:
+            cursor = connection.execution_options(stream_results=True, max_row_buffer=batch_size).execute(text(sql_query))
+            try:
+                for partition in cursor.partitions(batch_size):
+                    for row in partition:
+                        yield tuple(row)
+            finally:
+                cursor.close()
+
+    def _result_cache_key(self, method: str, sql_query: str, *args) -> Optional[tuple]:
+        if self._result_cache is None:
+            return None
+        return (self._conn_id, method, normalize_sql(sql_query, self._dialect)) + args
+
+    def _cache_result(self, cache_key: Optional[tuple], sql_query: str, result: Any):
+        """只缓存引用了已知表的只读查询，便于按表失效"""
+        if cache_key is None or not is_select_statement(strip_statement(sql_query, self._dialect)):
+            return
+        tables = extract_table_names(sql_query, self._mschema.tables.keys(), self._dialect)
+        if tables:
+            self._result_cache.set(cache_key, result, self._conn_id, tables)
+
+    def invalidate_cached_results(self, tables: Optional[List[str]] = None) -> int:
+        """表数据变化后调用，tables 为 None 时清空该连接相关的全部缓存"""
+        if self._result_cache is None:
+            return 0
+        if tables is None:
+            tables = list(self._mschema.tables.keys())
+        return self._result_cache.invalidate_tables(self._conn_id, tables)
+
+    def _invalidate_after_write(self, sql_query: str):
+        """
+        本服务执行的写操作提交后，按语句中引用的表使查询结果缓存失效
+        在事务提交之后调用，避免并发的读请求在失效后又缓存了提交前的数据
+        """
+        if self._result_cache is not None and not is_select_statement(strip_statement(sql_query, self._dialect)):
+            self.invalidate_cached_results(extract_table_names(sql_query, self._mschema.tables.keys(), self._dialect))
+
+    def fetch(self, sql_query: str, max_rows: Optional[int] = None, canceller: Optional[QueryCanceller] = None):
+        cache_key = self._result_cache_key('fetch', sql_query, max_rows)
+        if cache_key is not None:
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                return True, cached
         sql_query = preprocess_sql_query(sql_query)
 
         with self._engine.begin() as connection:
             try:
-                cursor = connection.execute(text(sql_query))
-                records = cursor.fetchall()
+                records, _ = self._execute_and_fetch(connection, sql_query, max_rows, canceller)
                 records = [tuple(row) for row in records]
-                return True, records
             except Exception as e:
                 # print("An exception occurred during SQL execution.\n", e)
-                records = str(e)
-            return False, records
+                return False, str(e)
+        self._invalidate_after_write(sql_query)
+        self._cache_result(cache_key, sql_query, records)
+        return True, records
 
-    def fetch_with_column_name(self, sql_query: str):
+    def fetch_with_column_name(self, sql_query: str, max_rows: Optional[int] = None):
         sql_query = preprocess_sql_query(sql_query)
 
         with self._engine.begin() as connection:
             try:
-                cursor = connection.execute(text(sql_query))
-                columns = cursor.keys()
-                records = cursor.fetchall()
+                records, columns = self._execute_and_fetch(connection, sql_query, max_rows)
             except Exception as e:
                 # print("An exception occurred during SQL execution.\n", e)
                 records = None
                 columns = []
-            return records, columns
+        if records is not None:
+            self._invalidate_after_write(sql_query)
+        return records, columns
 
     def fetch_with_error_info(self, sql_query: str) -> Tuple[List, str]:
         info = ''
@@ -108,29 +388,84 @@ class HITLSQLDatabase(SQLDatabase):
             except Exception as e:
                 info = str(e)
                 records = None
+        # 写操作在 fetchall 时才报错，但事务已经提交，失败时也按表失效
+        self._invalidate_after_write(sql_query)
         return records, info
 
     def fetch_truncated(self, sql_query: str, max_rows: Optional[int] = None, max_str_len: int = 30) -> Dict:
+        _, sql_res = self.fetch_truncated_with_status(sql_query, max_rows, max_str_len)
+        return sql_res
+
+    def explain(self, sql_query: str) -> Optional[str]:
+        """
+        用 EXPLAIN 让数据库只编译不执行查询，返回错误信息，没有错误时返回 None
+        只对只读查询生效，其他语句直接返回 None
+        """
+        tokens = strip_statement(preprocess_sql_query(sql_query), self._dialect)
+        if not is_select_statement(tokens):
+            return None
+        prefix = 'EXPLAIN QUERY PLAN ' if self._dialect == 'sqlite' else 'EXPLAIN '
+        with self._engine.connect() as connection:
+            try:
+                connection.execute(text(prefix + tokens_to_sql(tokens))).fetchall()
+                return None
+            except Exception as e:
+                return str(e)
+
+    def validate_sql(self, sql_query: str, explain: bool = False) -> List[str]:
+        """
+        执行前校验 SQL：先按 M-Schema 做本地检查（表、字段、括号等），
+        本地检查通过且 explain=True 时再用 EXPLAIN 让数据库检查，返回错误信息列表
+        """
+        errors = validate_sql(sql_query, self._mschema, self._dialect)
+        if not errors and explain:
+            error = self.explain(sql_query)
+            if error:
+                errors.append(error)
+        return errors
+
+    def fetch_truncated_with_status(self, sql_query: str, max_rows: Optional[int] = None,
+                                    max_str_len: int = 30, validate: bool = False,
+                                    explain: bool = False, canceller: Optional[QueryCanceller] = None) -> Tuple[bool, Dict]:
+        """
+        执行一次 SQL，同时返回是否执行成功和截断后的结果，
+        可以直接用于校验生成的 SQL，无需为了展示结果再执行一遍
+        validate: 执行前先做本地校验，发现错误时不访问数据库，直接返回错误信息
+        explain: 本地校验通过后再用 EXPLAIN 检查，仅在 validate=True 时生效
+        canceller: 调用方取消时用于中断正在执行的查询
+        """
+        cache_key = self._result_cache_key('truncated', sql_query, max_rows, max_str_len)
+        if cache_key is not None:
+            cached = self._result_cache.get(cache_key)
+            inc("xiyan_result_cache_total", result="miss" if cached is None else "hit")
+            if cached is not None:
+                return True, cached
+        if validate:
+            errors = self.validate_sql(sql_query, explain=explain)
+            if errors:
+                inc("xiyan_sql_validation_failures_total")
+                return False, {"truncated_results": "SQL validation failed:\n" + "\n".join(errors), "fields": []}
         sql_query = preprocess_sql_query(sql_query)
         with self._engine.begin() as connection:
             try:
-                cursor = connection.execute(text(sql_query))
-                result = cursor.fetchall()
+                result, fields = self._execute_and_fetch(connection, sql_query, max_rows, canceller)
                 truncated_results = []
-                if max_rows:
-                    result = result[:max_rows]
                 for row in result:
                     truncated_row = tuple(
                         self.truncate_word(column, length=max_str_len)
                         for column in row
                     )
                     truncated_results.append(truncated_row)
-                return {"truncated_results": truncated_results, "fields": list(cursor.keys())}
+                sql_res = {"truncated_results": truncated_results, "fields": fields}
+                inc("xiyan_rows_fetched_total", len(truncated_results))
             except Exception as e:
                 # print("An exception occurred during SQL execution.\n", e)
                 # records = None
                 records = str(e)
-                return {"truncated_results": records, "fields": []}
+                return False, {"truncated_results": records, "fields": []}
+        self._invalidate_after_write(sql_query)
+        self._cache_result(cache_key, sql_query, sql_res)
+        return True, sql_res
 
     def trunc_result_to_markdown(self, sql_res: Dict) -> str:
         """
@@ -152,32 +487,92 @@ class HITLSQLDatabase(SQLDatabase):
     
 
     def execute(self, sql_query: str, timeout=5) -> Any:
-        # import concurrent.futures
         sql_query = preprocess_sql_query(sql_query)
 
         with self._engine.begin() as connection:
             try:
-                cursor = connection.execute(text(sql_query))
-                return True
+                with statement_timeout(connection, timeout):
+                    cursor = connection.execute(text(sql_query))
             except Exception as e:
                 info = str(e)
                 print("SQL执行异常：", info)
                 return None
+        self._invalidate_after_write(sql_query)
+        return True
 
     def init_mschema(self):
-        for table_name in self._usable_tables:
-            table_comment = self.get_table_comment(table_name)
+        # 先记录结构指纹，内省期间发生的变化会在下次 refresh_mschema 时被发现
+        self._mschema.fingerprints = table_fingerprints(self._engine, self._schema) or {}
+        self._mschema.refreshed_at = time.time()
+        # 批量获取整个 schema 的注释、主键、外键和字段信息
+        catalog = bulk_introspect(self._engine, self._inspector, self._schema, self._usable_tables)
+        # 批量写入，结束时只清空一次渲染缓存
+        with self._mschema.batch_update():
+            self._add_tables(self._mschema, sorted(self._usable_tables), catalog)
+
+    def refresh_mschema(self, blocking: bool = True) -> Optional[Dict[str, List[str]]]:
+        """
+        增量刷新 M-Schema：对比每张表的结构指纹，只重新内省、采样新增和修改过的表，移除已删除的表，
+        在 M-Schema 上原地替换这些表（不影响正在使用旧快照的请求），并使相关表的查询结果缓存失效
+        返回 {"added": [...], "altered": [...], "dropped": [...]}；
+        blocking=False 且已有刷新正在进行时直接返回 None
+        """
+        mschema = self._mschema
+        if not mschema.refresh_lock.acquire(blocking):
+            return None
+        try:
+            inspector = inspect(self._engine)
+            fingerprints = table_fingerprints(self._engine, self._schema)
+            if fingerprints is None:
+                # 方言不支持指纹时，所有表都重新内省
+                fingerprints = {name: None for name in inspector.get_table_names(schema=self._schema)}
+            include_tables = getattr(self, '_include_tables', None)
+            ignore_tables = getattr(self, '_ignore_tables', None) or set()
+            current = {name: fp for name, fp in fingerprints.items()
+                       if (not include_tables or name in include_tables) and name not in ignore_tables}
+
+            added = sorted(name for name in current if name not in mschema.tables)
+            altered = sorted(name for name, fp in current.items()
+                             if name in mschema.tables and (fp is None or fp != mschema.fingerprints.get(name)))
+            dropped = sorted(name for name in mschema.tables if name not in current and name in mschema.fingerprints)
+            changed = added + altered
+            if changed or dropped:
+                staging = MSchema(db_id=mschema.db_id, schema=mschema.schema)
+                if changed:
+                    catalog = bulk_introspect(self._engine, inspector, self._schema, changed)
+                    with staging.batch_update():
+                        self._add_tables(staging, changed, catalog)
+                mschema.replace_tables(staging, changed, dropped)
+                self._usable_tables = sorted((set(self._usable_tables) | set(added)) - set(dropped))
+                self.invalidate_cached_results(changed + dropped)
+            mschema.fingerprints = current
+            mschema.refreshed_at = time.time()
+            return {"added": added, "altered": altered, "dropped": dropped}
+        finally:
+            mschema.refresh_lock.release()
+
+    def _add_tables(self, mschema: MSchema, table_names: List[str], catalog: Dict[str, Dict]):
+        """把内省结果写入 mschema，并为每张表采样示例值"""
+        for table_name in table_names:
+            table_catalog = catalog.get(table_name, new_table_catalog())
+            table_comment = table_catalog['comment']
             table_comment = '' if table_comment is None else table_comment.strip()
-            self._mschema.add_table(table_name, fields={}, comment=table_comment)
-            pks = self.get_pk_constraint(table_name)
+            mschema.add_table(table_name, fields={}, comment=table_comment)
+            pks = table_catalog['pks']
 
-            fks = self.get_foreign_keys(table_name)
+            fks = table_catalog['fks']
             for fk in fks:
                 referred_schema = fk['referred_schema']
                 for c, r in zip(fk['constrained_columns'], fk['referred_columns']):
-                    self._mschema.add_foreign_key(table_name, c, referred_schema, fk['referred_table'], r)
+                    mschema.add_foreign_key(table_name, c, referred_schema, fk['referred_table'], r)
 
-            fields = self._inspector.get_columns(table_name, schema=self._schema)
+            fields = table_catalog['columns']
+            table_examples = {}
+            if self.should_sample_table(table_catalog['row_count']):
+                try:
+                    table_examples = self.fetch_table_examples(table_name, [field['name'] for field in fields], 5)
+                except:
+                    table_examples = {}
             for field in fields:
                 field_type = f"{field['type']!s}"
                 field_name = field['name']
@@ -193,13 +588,9 @@ class HITLSQLDatabase(SQLDatabase):
                 if default is not None:
                     default = f'{default}'
 
-                try:
-                    examples = self.fectch_distinct_values(table_name, field_name, 5)
-                except:
-                    examples = []
-                examples = examples_to_str(examples)
+                examples = examples_to_str(table_examples.get(field_name, []))
 
-                self._mschema.add_field(table_name, field_name, field_type=field_type, primary_key=primary_key,
+                mschema.add_field(table_name, field_name, field_type=field_type, primary_key=primary_key,
                     nullable=field['nullable'], default=default, autoincrement=autoincrement,
                     comment=field_comment, examples=examples)
 
@@ -0,0 +1,236 @@
+"""
+M-Schema 二进制快照
+
+文件布局（小端）：
+    header    magic "XYMS" | 格式版本 u16 | 保留 u16 | 6 个 u64 依次为各段长度
+    meta      UTF-8 JSON：db_id、schema、fingerprints、saved_at
+    str_offs  u32 数组，字符串表中每个字符串在 str_blob 解码后的起止位置（n + 1 个）
+    str_blob  所有去重后的字符串拼接成的 UTF-8 文本
+    examples  u32 数组，依次为每组示例值：个数, 字符串 id...
+    tables    u32 数组，依次为每张表：表名 id, 注释 id, 字段数,
+              每个字段：字段名 id, 类型 id, 默认值 id, 注释 id, 示例组 id, 标志位, extra JSON id
+    fks       u32 数组，每个外键 5 个字符串 id
+各段按 8 字节对齐，u32 数组直接在 mmap 上 cast，不需要逐行解析；None 用 0xFFFFFFFF 表示
+格式变化时提升 FORMAT_VERSION，旧版本快照会被拒绝并回退到完整内省
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from datasource.db_mschema import MSchema
+from datasource.mschema_records import EMPTY_EXAMPLES, ExamplePool, FieldRecord, TableRecord
+
+MAGIC = b'XYMS'
+FORMAT_VERSION = 1
+NONE_ID = 0xFFFFFFFF
+_HEADER = struct.Struct('<4sHH6Q')
+_FLAG_PRIMARY_KEY = 1
+_FLAG_NULLABLE = 2
+_FLAG_AUTOINCREMENT = 4
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def id(self, value: Optional[str]) -> int:
+        if value is None:
+            return NONE_ID
+        value = str(value)
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return idx
+
+
+def _u32(values: List[int]) -> bytes:
+    arr = array('I', values)
+    if sys.byteorder != 'little':
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b'\0' * (-len(data) % 8)
+
+
+def save_snapshot(mschema: MSchema, file_path: str):
+    """写入二进制快照，先写临时文件再原子替换，读取方不会看到写了一半的文件"""
+    strings = _StringTable()
+    example_ids: Dict[tuple, int] = {}
+    examples: List[int] = []
+    tables: List[int] = []
+
+    def examples_id(values) -> int:
+        values = tuple(values or EMPTY_EXAMPLES)
+        idx = example_ids.get(values)
+        if idx is None:
+            idx = example_ids[values] = len(example_ids)
+            examples.append(len(values))
+            examples.extend(strings.id(v) for v in values)
+        return idx
+
+    for table_name, table_info in mschema.tables.items():
+        fields = table_info['fields']
+        tables.extend((strings.id(table_name), strings.id(table_info.get('comment')), len(fields)))
+        for field_name, field in fields.items():
+            flags = ((_FLAG_PRIMARY_KEY if field.get('primary_key') else 0)
+                     | (_FLAG_NULLABLE if field.get('nullable', True) else 0)
+                     | (_FLAG_AUTOINCREMENT if field.get('autoincrement') else 0))
+            extra = {k: v for k, v in field.items() if k not in FieldRecord.KEYS}
+            tables.extend((strings.id(field_name), strings.id(field.get('type', '')), strings.id(field.get('default')),
+                           strings.id(field.get('comment', '')), examples_id(field.get('examples')), flags,
+                           strings.id(json.dumps(extra, ensure_ascii=False)) if extra else NONE_ID))
+    fks = [strings.id(v) for fk in mschema.foreign_keys for v in fk]
+
+    offsets = [0]
+    for value in strings.strings:
+        offsets.append(offsets[-1] + len(value))
+    meta = json.dumps({"db_id": mschema.db_id, "schema": mschema.schema, "fingerprints": mschema.fingerprints,
+                       "saved_at": time.time()}, ensure_ascii=False).encode('utf-8')
+    sections = [meta, _u32(offsets), ''.join(strings.strings).encode('utf-8'), _u32(examples), _u32(tables), _u32(fks)]
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, *(len(s) for s in sections))
+
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(_pad(header))
+        for section in sections:
+            f.write(_pad(section))
+    os.replace(tmp_path, file_path)
+
+
+def _read_u32(view: memoryview) -> List[int]:
+    if sys.byteorder == 'little':
+        casted = view.cast('I')
+        try:
+            return casted.tolist()
+        finally:
+            casted.release()
+    arr = array('I')
+    arr.frombytes(view)
+    arr.byteswap()
+    return arr.tolist()
+
+
+def _string_getter(strings: List[str], file_path: str):
+    def s(idx: int, nullable: bool = True) -> Optional[str]:
+        if idx == NONE_ID and nullable:
+            return None
+        if idx >= len(strings):
+            raise SnapshotError(f"Corrupt M-Schema snapshot, string id {idx} out of range: {file_path}")
+        return strings[idx]
+    return s
+
+
+def load_snapshot(file_path: str, mschema: Optional[MSchema] = None) -> MSchema:
+    """
+    读取快照并构建 MSchema（传入 mschema 时原地填充）
+    格式、版本不符或文件截断、损坏（长度、偏移、下标越界）时抛出 SnapshotError，调用方据此回退到完整内省
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _HEADER.size:
+            raise SnapshotError(f"Truncated M-Schema snapshot: {file_path}")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    sections = []
+    try:
+        view = memoryview(mm)
+        try:
+            magic, version, _, *lengths = _HEADER.unpack_from(view, 0)
+            if magic != MAGIC:
+                raise SnapshotError(f"Not an M-Schema snapshot: {file_path}")
+            if version != FORMAT_VERSION:
+                raise SnapshotError(f"Unsupported M-Schema snapshot version {version}, expected {FORMAT_VERSION}")
+            pos = _HEADER.size + (-_HEADER.size % 8)
+            for idx, length in enumerate(lengths):
+                if pos + length > size:
+                    raise SnapshotError(f"Truncated M-Schema snapshot: {file_path}")
+                if idx in (1, 3, 4, 5) and length % 4:
+                    raise SnapshotError(f"Corrupt M-Schema snapshot, bad section length {length}: {file_path}")
+                sections.append(view[pos:pos + length])
+                pos += length + (-length % 8)
+            try:
+                meta = json.loads(bytes(sections[0]).decode('utf-8'))
+                blob = bytes(sections[2]).decode('utf-8')
+            except ValueError as e:
+                raise SnapshotError(f"Corrupt M-Schema snapshot, {e}: {file_path}") from e
+            offsets = _read_u32(sections[1])
+            examples_flat = _read_u32(sections[3])
+            tables_flat = _read_u32(sections[4])
+            fks_flat = _read_u32(sections[5])
+        finally:
+            for section in sections:
+                section.release()
+            view.release()
+    finally:
+        mm.close()
+
+    if not isinstance(meta, dict) or not offsets or offsets[0] != 0 or offsets[-1] != len(blob) \
+            or any(offsets[i] > offsets[i + 1] for i in range(len(offsets) - 1)):
+        raise SnapshotError(f"Corrupt M-Schema snapshot, bad string table: {file_path}")
+    if len(fks_flat) % 5:
+        raise SnapshotError(f"Corrupt M-Schema snapshot, bad foreign key section: {file_path}")
+    strings = [blob[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+    s = _string_getter(strings, file_path)
+
+    pool = ExamplePool()
+    example_groups = []
+    pos = 0
+    while pos < len(examples_flat):
+        count = examples_flat[pos]
+        if pos + 1 + count > len(examples_flat):
+            raise SnapshotError(f"Corrupt M-Schema snapshot, truncated examples: {file_path}")
+        example_groups.append(pool.get([s(i, nullable=False) for i in examples_flat[pos + 1:pos + 1 + count]]))
+        pos += 1 + count
+
+    tables = {}
+    pos = 0
+    while pos < len(tables_flat):
+        if pos + 3 > len(tables_flat):
+            raise SnapshotError(f"Corrupt M-Schema snapshot, truncated table record: {file_path}")
+        table_name, comment, field_count = tables_flat[pos:pos + 3]
+        pos += 3
+        if pos + 7 * field_count > len(tables_flat):
+            raise SnapshotError(f"Corrupt M-Schema snapshot, truncated field records: {file_path}")
+        fields = {}
+        for _ in range(field_count):
+            name, type_id, default, field_comment, examples_id, flags, extra = tables_flat[pos:pos + 7]
+            pos += 7
+            if examples_id >= len(example_groups):
+                raise SnapshotError(f"Corrupt M-Schema snapshot, example id {examples_id} out of range: {file_path}")
+            try:
+                extra = json.loads(s(extra, nullable=False)) if extra != NONE_ID else None
+            except ValueError as e:
+                raise SnapshotError(f"Corrupt M-Schema snapshot, {e}: {file_path}") from e
+            fields[s(name, nullable=False)] = FieldRecord(
+                type=s(type_id) or '', primary_key=bool(flags & _FLAG_PRIMARY_KEY),
+                nullable=bool(flags & _FLAG_NULLABLE), default=s(default),
+                autoincrement=bool(flags & _FLAG_AUTOINCREMENT), comment=s(field_comment),
+                examples=example_groups[examples_id], extra=extra)
+        tables[s(table_name, nullable=False)] = TableRecord(fields, s(comment))
+    foreign_keys = [[s(i) for i in fks_flat[pos:pos + 5]] for pos in range(0, len(fks_flat), 5)]
+
+    if mschema is None:
+        mschema = MSchema()
+    mschema.db_id = meta.get('db_id', 'Anonymous')
+    mschema.schema = meta.get('schema')
+    mschema.tables = tables
+    mschema.foreign_keys = foreign_keys
+    mschema._example_pool = pool
+    mschema.fingerprints = meta.get('fingerprints') or {}
+    # 快照可能已经过时，置为保存时间，便于调用方据此决定何时校验
+    mschema.refreshed_at = meta.get('saved_at', 0.0)
+    mschema.invalidate()
+    return mschema
@@ -0,0 +1,49 @@
+from typing import Callable, Optional
+
+from config.db_config import DBConfig
+from datasource.db_mschema import MSchema
+from utils.cache_util import TTLCache
+
+
+class MSchemaCache:
+    """
+    进程级 M-Schema 缓存，按 DBConfig 标识共享，避免每次提问都重新做 schema 内省
+    ttl: 缓存有效期（秒），None 表示直到显式失效前一直有效
+    """
+    def __init__(self, ttl: Optional[float] = 3600, max_size: Optional[int] = 64):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    @property
+    def ttl(self) -> Optional[float]:
+        return self._cache.ttl
+
+    @ttl.setter
+    def ttl(self, ttl: Optional[float]):
+        self._cache.ttl = ttl
+
+    @property
+    def max_size(self) -> Optional[int]:
+        return self._cache.max_size
+
+    @max_size.setter
+    def max_size(self, max_size: Optional[int]):
+        self._cache.max_size = max_size
+
+    def get(self, db_config: DBConfig) -> Optional[MSchema]:
+        return self._cache.get(db_config.cache_key())
+
+    def set(self, db_config: DBConfig, mschema: MSchema):
+        self._cache.set(db_config.cache_key(), mschema)
+
+    def get_or_build(self, db_config: DBConfig, builder: Callable[[], MSchema]) -> MSchema:
+        """命中缓存直接返回，否则调用 builder 做一次完整内省并缓存结果"""
+        return self._cache.get_or_create(db_config.cache_key(), builder)
+
+    def invalidate(self, db_config: DBConfig) -> bool:
+        return self._cache.invalidate(db_config.cache_key())
+
+    def clear(self):
+        self._cache.clear()
+
+
+mschema_cache = MSchemaCache()
@@ -0,0 +1,164 @@
+import logging
+import math
+import re
+import threading
+import weakref
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from datasource.db_mschema import MSchema
+
+logger = logging.getLogger("xiyan_mcp_server")
+
+_CAMEL_RE = re.compile(r'([a-z0-9])([A-Z])')
+_ASCII_WORD_RE = re.compile(r'[a-z0-9]+')
+_CJK_RUN_RE = re.compile(r'[一-鿿]+')
+
+# 不同来源的词在表文档中的权重
+TABLE_NAME_WEIGHT = 3
+COLUMN_NAME_WEIGHT = 2
+COMMENT_WEIGHT = 2
+EXAMPLE_WEIGHT = 1
+
+
+def text_terms(text: str) -> List[str]:
+    """英文按单词切分（拆开下划线和驼峰，去掉复数 s），中文按字 bigram 切分"""
+    if not text:
+        return []
+    text = _CAMEL_RE.sub(r'\1 \2', str(text)).lower()
+    terms = []
+    for word in _ASCII_WORD_RE.findall(text):
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+class SchemaLinker:
+    """
+    基于 MSchema 的表名、字段名、注释和示例值建立内存倒排索引，
+    按 BM25 为问题挑选最相关的 top_k 张表，并补上外键关联的表，用于裁剪 prompt 中的 schema
+    embed_fn: 可选，输入文本列表返回向量列表，设置后与词法得分加权融合
+    """
+    def __init__(self, mschema: MSchema, embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 embedding_weight: float = 0.5, k1: float = 1.2, b: float = 0.75):
+        self.embed_fn = embed_fn
+        self.version = mschema.version
+        self.embedding_weight = embedding_weight
+        self.k1 = k1
+        self.b = b
+        self._table_terms: Dict[str, Counter] = {}
+        self._table_docs: Dict[str, str] = {}
+        self._table_embeddings: Optional[Dict[str, List[float]]] = None
+        self._doc_freq = Counter()
+        self._avg_len = 0.0
+        # 不持有 MSchema 本身，以便 get_schema_linker 的弱引用缓存能随 MSchema 一起释放
+        self._foreign_keys = [(fk[0], fk[3]) for fk in mschema.foreign_keys]
+        self._build_index(mschema)
+
+    def _build_index(self, mschema: MSchema):
+        for table_name, table_info in mschema.tables.items():
+            terms = Counter()
+            doc = [table_name, table_info.get('comment') or '']
+            for term in text_terms(table_name):
+                terms[term] += TABLE_NAME_WEIGHT
+            for term in text_terms(table_info.get('comment') or ''):
+                terms[term] += COMMENT_WEIGHT
+            for field_name, field_info in table_info['fields'].items():
+                doc.append(f"{field_name} {field_info.get('comment') or ''}")
+                for term in text_terms(field_name):
+                    terms[term] += COLUMN_NAME_WEIGHT
+                for term in text_terms(field_info.get('comment') or ''):
+                    terms[term] += COMMENT_WEIGHT
+                for example in field_info.get('examples', []):
+                    for term in text_terms(example):
+                        terms[term] += EXAMPLE_WEIGHT
+            self._table_terms[table_name] = terms
+            self._table_docs[table_name] = ' '.join(s for s in doc if s)
+            self._doc_freq.update(terms.keys())
+        if self._table_terms:
+            self._avg_len = sum(sum(t.values()) for t in self._table_terms.values()) / len(self._table_terms)
+
+    def lexical_scores(self, question: str) -> Dict[str, float]:
+        query_terms = set(text_terms(question))
+        n = len(self._table_terms)
+        scores = {}
+        for table_name, terms in self._table_terms.items():
+            doc_len = sum(terms.values())
+            score = 0.0
+            for term in query_terms:
+                tf = terms.get(term, 0)
+                if tf == 0:
+                    continue
+                df = self._doc_freq[term]
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                score += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * doc_len / (self._avg_len or 1)))
+            scores[table_name] = score
+        return scores
+
+    def embedding_scores(self, question: str) -> Dict[str, float]:
+        if self._table_embeddings is None:
+            table_names = list(self._table_docs.keys())
+            vectors = self.embed_fn([self._table_docs[t] for t in table_names])
+            self._table_embeddings = dict(zip(table_names, vectors))
+        question_vector = self.embed_fn([question])[0]
+        return {t: cosine(question_vector, v) for t, v in self._table_embeddings.items()}
+
+    def link(self, question: str, top_k: int = 8, with_fk_neighbours: bool = True) -> Optional[List[str]]:
+        """返回与问题相关的表名列表，没有任何表命中时返回 None，由调用方退回完整 schema"""
+        scores = self.lexical_scores(question)
+        max_score = max(scores.values(), default=0.0)
+        semantic = None
+        if self.embed_fn is not None:
+            try:
+                semantic = self.embedding_scores(question)
+            except Exception as e:
+                # 向量服务不可用时只用 BM25 词法得分，不影响问题本身
+                logger.warning(f"Embedding failed, falling back to lexical schema linking: {e}")
+        if semantic is not None:
+            scores = {t: (1 - self.embedding_weight) * (s / max_score if max_score > 0 else 0.0)
+                      + self.embedding_weight * semantic.get(t, 0.0) for t, s in scores.items()}
+            max_score = max(scores.values(), default=0.0)
+        if max_score <= 0:
+            return None
+
+        ranked = sorted((t for t, s in scores.items() if s > 0), key=lambda t: (-scores[t], t))
+        selected = ranked[:top_k]
+        if with_fk_neighbours:
+            # 只补充直接相连的表，不继续沿外键扩散
+            seeds = set(selected)
+            for table_name, ref_table_name in self._foreign_keys:
+                if table_name in seeds:
+                    neighbour = ref_table_name
+                elif ref_table_name in seeds:
+                    neighbour = table_name
+                else:
+                    continue
+                if neighbour not in selected and neighbour in self._table_terms:
+                    selected.append(neighbour)
+        return selected
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+_linkers = weakref.WeakKeyDictionary()
+_linkers_lock = threading.Lock()
+
+
+def get_schema_linker(mschema: MSchema, embed_fn: Optional[Callable] = None) -> SchemaLinker:
+    """每个 MSchema 只建立一次索引，MSchema 修改后重建，被回收后索引一并释放"""
+    with _linkers_lock:
+        linker = _linkers.get(mschema)
+        if linker is None or linker.embed_fn is not embed_fn or linker.version != mschema.version:
+            linker = SchemaLinker(mschema, embed_fn=embed_fn)
+            _linkers[mschema] = linker
+        return linker
@@ -0,0 +1,76 @@
+from typing import Any, Iterable, List, Optional
+
+from sqlalchemy import MetaData, inspect
+from sqlalchemy.engine import Engine
+
+
+class SQLDatabase:
+    """
+    HITLSQLDatabase 的轻量基类，提供原先从 llama_index SQLDatabase 继承的属性和方法
+    不再在初始化时反射全部表的 MetaData（M-Schema 另有批量内省），metadata_obj 在首次访问时才反射
+    """
+    def __init__(self, engine: Engine, schema: Optional[str] = None, metadata: Optional[MetaData] = None,
+                 ignore_tables: Optional[List[str]] = None, include_tables: Optional[List[str]] = None,
+                 sample_rows_in_table_info: int = 3, indexes_in_table_info: bool = False,
+                 custom_table_info: Optional[dict] = None, view_support: bool = False, max_string_length: int = 300):
+        if include_tables and ignore_tables:
+            raise ValueError("Cannot specify both include_tables and ignore_tables")
+        if not isinstance(sample_rows_in_table_info, int):
+            raise TypeError("sample_rows_in_table_info must be an integer")
+        self._engine = engine
+        self._schema = schema
+        self._inspector = inspect(engine)
+        self._view_support = view_support
+        self._all_tables = set(self._inspector.get_table_names(schema=schema)
+                               + (self._inspector.get_view_names(schema=schema) if view_support else []))
+
+        self._include_tables = set(include_tables) if include_tables else set()
+        missing_tables = self._include_tables - self._all_tables
+        if missing_tables:
+            raise ValueError(f"include_tables {missing_tables} not found in database")
+        self._ignore_tables = set(ignore_tables) if ignore_tables else set()
+        missing_tables = self._ignore_tables - self._all_tables
+        if missing_tables:
+            raise ValueError(f"ignore_tables {missing_tables} not found in database")
+        self._usable_tables = set(self.get_usable_table_names()) or self._all_tables
+
+        self._sample_rows_in_table_info = sample_rows_in_table_info
+        self._indexes_in_table_info = indexes_in_table_info
+        self._custom_table_info = {table: info for table, info in (custom_table_info or {}).items()
+                                   if table in self._all_tables} if custom_table_info else None
+        self._max_string_length = max_string_length
+        self._metadata = metadata or MetaData()
+        self._metadata_reflected = False
+
+    @property
+    def engine(self) -> Engine:
+        return self._engine
+
+    @property
+    def metadata_obj(self) -> MetaData:
+        """SQLAlchemy MetaData，首次访问时反射可用表"""
+        if not self._metadata_reflected:
+            self._metadata.reflect(views=self._view_support, bind=self._engine, only=list(self._usable_tables),
+                                   schema=self._schema)
+            self._metadata_reflected = True
+        return self._metadata
+
+    @property
+    def dialect(self) -> str:
+        return self._engine.dialect.name
+
+    def get_usable_table_names(self) -> Iterable[str]:
+        if self._include_tables:
+            return sorted(self._include_tables)
+        return sorted(self._all_tables - self._ignore_tables)
+
+    def get_table_columns(self, table_name: str) -> List[Any]:
+        return self._inspector.get_columns(table_name, schema=self._schema)
+
+    def truncate_word(self, content: Any, *, length: int, suffix: str = "...") -> str:
+        """把过长的字符串截断到 length 以内，尽量在单词边界处截断"""
+        if not isinstance(content, str) or length <= 0:
+            return content
+        if len(content) <= length:
+            return content
+        return content[: length - len(suffix)].rsplit(" ", 1)[0] + suffix
@@ -1,19 +1,41 @@
+import asyncio
+import csv
+import hashlib
+import io
+import json
 import logging
 import os
+import threading
+import time
+from typing import Optional
 
 
-from mysql.connector import connect, Error
 from mcp.server import  FastMCP
 from mcp.types import TextContent
+from sqlalchemy.exc import SQLAlchemyError
 from config.db_config import DBConfig
+from config.db_registry import DBRegistry, load_db_registry
 from database_env import DataBaseEnv
+from datasource.db_mschema import MSchema
 from datasource.db_source import HITLSQLDatabase
-from utils.db_util import init_db_conn
+from datasource.mschema_snapshot import load_snapshot
+from datasource.schema_cache import mschema_cache
+from utils.db_util import get_engine
 from utils.file_util import extract_sql_from_qwen
-from utils.llm_util import call_dashscope
+from utils.sql_util import push_down_limit
+from utils.async_util import get_db_executor, run_in_db_thread, set_db_max_workers
+from utils.query_guard import QueryCanceller
+from utils import trace_util
+from utils.trace_util import inc, span
+from utils.llm_util import acall_dashscope, astream_dashscope_sql, get_llm_client
+from utils.question_cache import QuestionSQLCache
+from utils.result_cache import ResultCache
 
 mcp = FastMCP("xiyan")
 
+# 工具返回给用户的最大行数，同时作为改写 SQL 时下推的 LIMIT
+MAX_RESULT_ROWS = 100
+
 
 # Configure logging
 logging.basicConfig(
@@ -26,7 +48,9 @@ def get_model_config():
     model_config ={
         "name":os.getenv("MODEL_NAME","qwen-max-0125"),
         "key":os.getenv("MODEL_KEY",""),
-        "url":os.getenv("MODEL_URL","https://dashscope.aliyuncs.com/compatible-mode/v1")
+        "url":os.getenv("MODEL_URL","https://dashscope.aliyuncs.com/compatible-mode/v1"),
+        "timeout":float(os.getenv("MODEL_TIMEOUT","60")),
+        "max_retries":int(os.getenv("MODEL_MAX_RETRIES","2"))
     }
     if not all([model_config["name"], model_config["key"]]):
         logger.error("Missing required model configuration. Please check environment variables:")
@@ -53,43 +77,319 @@ def get_db_config():
     
     return config
 
+def optional_float_env(name: str, default: str = ""):
+    """读取可选的数值配置，未设置或 <=0 时返回 None"""
+    value = os.getenv(name, default)
+    return float(value) if value and float(value) > 0 else None
+
+def get_db_defaults() -> dict:
+    """连接池和查询保护的默认配置，配置文件中的库未单独设置时使用"""
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "3600")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+        "statement_timeout": optional_float_env("DB_STATEMENT_TIMEOUT", "30"),
+        "max_estimated_rows": optional_float_env("DB_MAX_ESTIMATED_ROWS"),
+        "max_estimated_cost": optional_float_env("DB_MAX_ESTIMATED_COST"),
+        "sample_time_budget": optional_float_env("DB_SAMPLE_TIME_BUDGET", "2"),
+        "max_sample_table_rows": optional_float_env("DB_MAX_SAMPLE_TABLE_ROWS"),
+        "sample_high_cardinality_ratio": optional_float_env("DB_SAMPLE_HIGH_CARDINALITY_RATIO"),
+    }
+
 def get_xiyan_config(db_config):
-    xiyan_db_config = DBConfig(dialect='mysql',db_name=db_config['database'], user_name=db_config['user'], db_pwd=db_config['password'], db_host=db_config['host'], port=db_config['port'])
+    xiyan_db_config = DBConfig(dialect='mysql',db_name=db_config['database'], user_name=db_config['user'], db_pwd=db_config['password'], db_host=db_config['host'], port=db_config['port'],
+                               **get_db_defaults())
     return xiyan_db_config
 
-global_db_config = get_db_config()
-global_xiyan_db_config = get_xiyan_config(global_db_config)
-model_config = get_model_config()
-model_name= model_config['name']
-model_key=model_config['key']
-model_url = model_config['url']
+def get_db_registry() -> DBRegistry:
+    """
+    XIYAN_DB_CONFIG 指向 JSON 配置文件时从中加载多个库，
+    否则退回到 MYSQL_* 环境变量配置的单个库，库名即 MYSQL_DATABASE
+    """
+    config_path = os.getenv("XIYAN_DB_CONFIG")
+    if config_path:
+        return load_db_registry(config_path, get_db_defaults())
+    db_config = get_db_config()
+    registry = DBRegistry()
+    registry.register(db_config['database'], get_xiyan_config(db_config))
+    return registry
+
+_db_registry = None
+_model_config = None
+_config_lock = threading.Lock()
+
+
+def db_registry() -> DBRegistry:
+    """首次使用时才读取数据库配置，import server 不依赖数据库环境变量，也不会因配置缺失而失败"""
+    global _db_registry
+    if _db_registry is None:
+        with _config_lock:
+            if _db_registry is None:
+                registry = get_db_registry()
+                # 同时缓存 M-Schema 的库数量，至少容纳注册表中的全部库
+                mschema_cache.max_size = max(mschema_cache_size, len(registry))
+                _db_registry = registry
+    return _db_registry
+
+
+def model_config() -> dict:
+    """首次调用模型时才读取模型配置"""
+    global _model_config
+    if _model_config is None:
+        with _config_lock:
+            if _model_config is None:
+                _model_config = get_model_config()
+    return _model_config
+
+
+# M-Schema 缓存有效期（秒），<=0 表示不过期，仅在显式失效时重建
+mschema_cache_ttl = float(os.getenv("MSCHEMA_CACHE_TTL", "3600"))
+mschema_cache.ttl = mschema_cache_ttl if mschema_cache_ttl > 0 else None
+# 距上次检查超过该秒数时，在后台按表结构指纹增量刷新 M-Schema，0 表示只在调用 refresh_schema 时刷新
+schema_refresh_interval = float(os.getenv("SCHEMA_REFRESH_INTERVAL", "0"))
+# M-Schema 二进制快照目录：重启后直接加载快照回答第一个问题，再在后台按表结构指纹与线上库校验；为空时不使用快照
+mschema_snapshot_dir = os.getenv("MSCHEMA_SNAPSHOT_DIR", "")
+mschema_cache_size = int(os.getenv("MSCHEMA_CACHE_SIZE", "64"))
+# 分阶段耗时和计数指标，XIYAN_METRICS=false 时关闭
+trace_util.set_enabled(os.getenv("XIYAN_METRICS", "true").lower() in ("1", "true", "yes"))
+# 数据库操作线程池大小，决定同时执行的数据库任务数
+set_db_max_workers(int(os.getenv("DB_MAX_WORKERS", "8")))
+
+# 问题 -> SQL 缓存，QUESTION_CACHE_SIZE=0 时关闭
+question_cache_size = int(os.getenv("QUESTION_CACHE_SIZE", "1024"))
+question_cache_ttl = float(os.getenv("QUESTION_CACHE_TTL", "0"))
+question_cache_similarity = float(os.getenv("QUESTION_CACHE_SIMILARITY", "0"))
+question_cache = QuestionSQLCache(
+    max_size=question_cache_size,
+    ttl=question_cache_ttl if question_cache_ttl > 0 else None,
+    persist_path=os.getenv("QUESTION_CACHE_PATH") or None,
+    similarity_threshold=question_cache_similarity if question_cache_similarity > 0 else None,
+) if question_cache_size > 0 else None
+
+# 查询结果缓存，默认关闭：本服务执行的写操作（包括生成的 SQL）和 schema 刷新会按表失效，
+# 其他客户端写入的数据在 RESULT_CACHE_TTL 内不可见，能接受这一延迟时再设置 RESULT_CACHE_MB 开启
+result_cache_mb = float(os.getenv("RESULT_CACHE_MB", "0"))
+result_cache_ttl = float(os.getenv("RESULT_CACHE_TTL", "60"))
+result_cache = ResultCache(
+    max_bytes=int(result_cache_mb * 1024 * 1024),
+    ttl=result_cache_ttl if result_cache_ttl > 0 else None,
+) if result_cache_mb > 0 else None
+
+# schema linking：SCHEMA_LINK_TOP_K=0 时关闭，始终使用完整 schema
+schema_link_top_k = int(os.getenv("SCHEMA_LINK_TOP_K", "8"))
+schema_link_min_tables = int(os.getenv("SCHEMA_LINK_MIN_TABLES", "20"))
+schema_link_embedding_model = os.getenv("SCHEMA_LINK_EMBEDDING_MODEL", "")
+# 单次 embeddings 请求的文本条数上限，DashScope 兼容接口每批最多 10 条
+schema_link_embedding_batch_size = max(int(os.getenv("SCHEMA_LINK_EMBEDDING_BATCH_SIZE", "10")), 1)
+# prompt 中 schema 的打乱种子，固定后 schema 前缀在请求间保持一致；设为空则每次随机打乱
+mschema_render_seed = os.getenv("MSCHEMA_RENDER_SEED", "0")
+mschema_render_seed = int(mschema_render_seed) if mschema_render_seed else None
+# 每轮 sql_fix 并发生成并校验的候选 SQL 数量，1 表示逐个串行修复
+sql_fix_candidates = max(int(os.getenv("SQL_FIX_CANDIDATES", "1")), 1)
+# 流式生成：```sql 代码块闭合后立即返回并断开，不再等待后续的解释文字
+llm_stream = os.getenv("LLM_STREAM", "true").lower() in ("1", "true", "yes")
+# 执行前按 M-Schema 本地校验 SQL，有错误时直接交给 sql_fix，不访问数据库
+sql_validate = os.getenv("SQL_VALIDATE", "true").lower() in ("1", "true", "yes")
+# 本地校验通过后再用 EXPLAIN 让数据库检查一遍（只编译不执行）
+sql_explain_check = os.getenv("SQL_EXPLAIN_CHECK", "false").lower() in ("1", "true", "yes")
+# 表数据预览（mysql:// 与 xiyan://databases/.../tables/... 资源、preview_table 工具）每页行数和单元格最大字符数
+preview_page_size = max(int(os.getenv("PREVIEW_PAGE_SIZE", "100")), 1)
+preview_max_cell_length = max(int(os.getenv("PREVIEW_MAX_CELL_LENGTH", "100")), 8)
+# 除第一个候选外，其余候选使用的采样温度，让并发候选之间有差异
+sql_fix_temperature = float(os.getenv("SQL_FIX_TEMPERATURE", "0.7"))
+
+
+async def generate_sql(param: dict, stop_at_first_block: bool = True) -> str:
+    """
+    调用模型并从输出中提取 SQL
+    stop_at_first_block: 流式生成时第一个 ```sql 代码块闭合即返回；sql_fix 的回答可能先引用出错的 SQL
+                         再给出修正后的 SQL，需要读完整个输出并与非流式一样取最后一个代码块
+    """
+    with span("llm_generate", stream=llm_stream):
+        if llm_stream:
+            return await astream_dashscope_sql(stop_at_first_block=stop_at_first_block, **param)
+        response = await acall_dashscope(**param)
+        return extract_sql_from_qwen(response.choices[0].message.content)
+
+
+async def execute_sql(db_env, sql_query: str):
+    """
+    在数据库线程中校验并执行生成的 SQL，返回 (status, sql_res)
+    协程被取消（如并发候选中已有胜出者）时中断正在执行的查询，连接立即归还连接池
+    """
+    canceller = QueryCanceller()
+    try:
+        with span("db_execute"):
+            return await run_in_db_thread(db_env.database.fetch_truncated_with_status, sql_query, max_rows=MAX_RESULT_ROWS,
+                                          validate=sql_validate, explain=sql_explain_check, canceller=canceller)
+    except asyncio.CancelledError:
+        # MySQL 需要另开连接执行 KILL QUERY，放到默认线程池中，不阻塞事件循环
+        asyncio.get_running_loop().run_in_executor(None, canceller.cancel)
+        raise
+
+
+def embed_texts(texts: list) -> list:
+    config = model_config()
+    client = get_llm_client(config['key'], config['url'], config['timeout'], config['max_retries'])
+    vectors = []
+    for start in range(0, len(texts), schema_link_embedding_batch_size):
+        batch = texts[start:start + schema_link_embedding_batch_size]
+        response = client.embeddings.create(model=schema_link_embedding_model, input=batch)
+        vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+    return vectors
+
+
+def mschema_snapshot_path(xiyan_config: DBConfig) -> str:
+    """每个库一个快照文件，文件名由连接标识生成"""
+    key = hashlib.sha1(repr(xiyan_config.cache_key()).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(mschema_snapshot_dir, f"{xiyan_config.dialect}_{key}.xyms")
+
+
+def load_mschema_snapshot(xiyan_config: DBConfig) -> Optional[MSchema]:
+    """读取快照，不存在、损坏或版本不符时返回 None，由调用方完整内省"""
+    snapshot_path = mschema_snapshot_path(xiyan_config)
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        return load_snapshot(snapshot_path)
+    except Exception as e:
+        # 快照只是加速手段，任何读取问题都回退到完整内省
+        logger.warning(f"Ignoring M-Schema snapshot {snapshot_path}: {e}")
+        return None
+
+
+def save_mschema_snapshot(xiyan_config: DBConfig, mschema: MSchema):
+    try:
+        mschema.save_snapshot(mschema_snapshot_path(xiyan_config))
+    except OSError as e:
+        logger.warning(f"Failed to save M-Schema snapshot: {e}")
+
+
+def refresh_db_source(db_source: HITLSQLDatabase, xiyan_config: DBConfig, blocking: bool = True):
+    """增量刷新 M-Schema，有表变化时同步更新快照"""
+    changes = db_source.refresh_mschema(blocking)
+    if mschema_snapshot_dir and changes and any(changes.values()):
+        save_mschema_snapshot(xiyan_config, db_source.mschema)
+    return changes
+
 
+# 每个库复用同一个 HITLSQLDatabase，M-Schema 或连接池重建后随之替换
+_db_sources = {}
+_db_sources_lock = threading.Lock()
 
-@mcp.resource('mysql://'+global_db_config['database'])
-async def read_resource() -> str:
 
-    db_engine = init_db_conn(global_xiyan_db_config)
-    db_source = HITLSQLDatabase(db_engine)
+def get_db_source(xiyan_config: DBConfig) -> HITLSQLDatabase:
+    """
+    返回库对应的 HITLSQLDatabase，连接池、M-Schema 和 HITLSQLDatabase 本身均复用进程级缓存，
+    缓存命中时不访问数据库目录
+    """
+    db_engine = get_engine(xiyan_config)
+    db_kwargs = {
+        "result_cache": result_cache,
+        "statement_timeout": xiyan_config.statement_timeout,
+        "max_estimated_rows": xiyan_config.max_estimated_rows,
+        "max_estimated_cost": xiyan_config.max_estimated_cost,
+        "sample_time_budget": xiyan_config.sample_time_budget,
+        "max_sample_table_rows": xiyan_config.max_sample_table_rows,
+        "sample_high_cardinality_ratio": xiyan_config.sample_high_cardinality_ratio,
+    }
+    built = []
+
+    def build_mschema():
+        snapshot = load_mschema_snapshot(xiyan_config) if mschema_snapshot_dir else None
+        if snapshot is not None:
+            with span("load_mschema_snapshot"):
+                built.append(HITLSQLDatabase(db_engine, mschema=snapshot, **db_kwargs))
+            inc("xiyan_mschema_snapshot_total", result="hit")
+            # 快照可能已过时，后台按指纹校验，只重新内省有变化的表
+            get_db_executor().submit(refresh_db_source, built[0], xiyan_config, False)
+            return snapshot
+        with span("init_mschema"):
+            built.append(HITLSQLDatabase(db_engine, **db_kwargs))
+        if mschema_snapshot_dir:
+            inc("xiyan_mschema_snapshot_total", result="miss")
+            save_mschema_snapshot(xiyan_config, built[0].mschema)
+        return built[0].mschema
+
+    mschema = mschema_cache.get_or_build(xiyan_config, build_mschema)
+    inc("xiyan_mschema_cache_total", result="miss" if built else "hit")
+    key = xiyan_config.cache_key()
+    if built:
+        with _db_sources_lock:
+            _db_sources[key] = built[0]
+        return built[0]
+    with _db_sources_lock:
+        db_source = _db_sources.get(key)
+        if db_source is None or db_source.mschema is not mschema or db_source.engine is not db_engine:
+            db_source = _db_sources[key] = HITLSQLDatabase(db_engine, mschema=mschema, **db_kwargs)
+    if schema_refresh_interval > 0 and time.time() - mschema.refreshed_at > schema_refresh_interval:
+        # 后台增量刷新，当前请求继续使用现有的 M-Schema
+        get_db_executor().submit(refresh_db_source, db_source, xiyan_config, False)
+    return db_source
+
+
+async def read_default_schema() -> str:
+
+    db_source = await run_in_db_thread(get_db_source, db_registry().get())
     return db_source.mschema.to_mschema()
 
+
+def render_table_page(page: dict) -> str:
+    """CSV 格式输出一页数据，还有下一页时在末尾给出游标"""
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(page["columns"])
+    writer.writerows(["" if value is None else value for value in row] for row in page["rows"])
+    if page["next_cursor"]:
+        output.write(f"# next_cursor: {page['next_cursor']}\n")
+    return output.getvalue()
+
+
+def read_table_rows(table_name: str, xiyan_config: DBConfig = None, columns: list = None, cursor: str = None,
+                    limit: int = None) -> str:
+    """通过连接池分页读取表数据，表名、字段名均按 M-Schema 校验"""
+    db_source = get_db_source(xiyan_config or db_registry().get())
+    page = db_source.preview_table(table_name, columns=columns, cursor=cursor, limit=limit or preview_page_size,
+                                   max_cell_len=preview_max_cell_length)
+    return render_table_page(page)
+
 @mcp.resource("mysql://{table_name}")
 async def read_resource(table_name) -> str:
-    """Read table contents."""
-    config = get_db_config()
+    """Read the first page of table contents."""
+    try:
+        return await run_in_db_thread(read_table_rows, table_name)
+
+    except (SQLAlchemyError, ValueError) as e:
+        raise RuntimeError(f"Database error: {str(e)}")
+
+
+@mcp.resource("xiyan://databases/{database}/schema")
+async def read_database_schema(database: str) -> str:
+    """M-Schema of a configured database."""
+    db_source = await run_in_db_thread(get_db_source, db_registry().get(database))
+    return db_source.mschema.to_mschema()
+
+
+@mcp.resource("xiyan://databases/{database}/tables/{table_name}")
+async def read_database_table(database: str, table_name: str) -> str:
+    """Read the first page of table contents of a configured database."""
     try:
-        with connect(**config) as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(f"SELECT * FROM {table_name} LIMIT 100")
-                columns = [desc[0] for desc in cursor.description]
-                rows = cursor.fetchall()
-                result = [",".join(map(str, row)) for row in rows]
-                return "\n".join([",".join(columns)] + result)
-                
-    except Error as e:
+        return await run_in_db_thread(read_table_rows, table_name, db_registry().get(database))
+    except (SQLAlchemyError, ValueError) as e:
         raise RuntimeError(f"Database error: {str(e)}")
 
 
-def sql_gen_and_execute(db_env, query: str):
+@mcp.resource("xiyan://databases/{database}/tables/{table_name}/pages/{cursor}")
+async def read_database_table_page(database: str, table_name: str, cursor: str) -> str:
+    """Read the page of table contents after the next_cursor of the previous page."""
+    try:
+        return await run_in_db_thread(read_table_rows, table_name, db_registry().get(database), None, cursor)
+    except (SQLAlchemyError, ValueError) as e:
+        raise RuntimeError(f"Database error: {str(e)}")
+
+
+async def sql_gen_and_execute(db_env, query: str):
     """
     Transfers the input natural language question to sql query (known as Text-to-sql) and executes it on the database.
      Args:
@@ -97,43 +397,110 @@ def sql_gen_and_execute(db_env, query: str):
     """
 
     #db_env = context_variables.get('db_env', None)
-    prompt = f"""你现在是一名{db_env.dialect}数据分析专家，你的任务是根据参考的数据库schema和用户的问题，编写正确的SQL来回答用户的问题，生成的SQL用```sql 和```包围起来。
+    try:
+        if question_cache is not None:
+            cached_sql = question_cache.get(query, db_env.mschema_hash)
+            inc("xiyan_question_cache_total", result="miss" if cached_sql is None else "hit")
+            if cached_sql is not None:
+                with span("db_execute", cached=True):
+                    status, sql_res = await run_in_db_thread(db_env.database.fetch_truncated_with_status, cached_sql, max_rows=MAX_RESULT_ROWS)
+                if status:
+                    logger.info(f"Question cache hit: {query}")
+                    inc("xiyan_requests_total", status="success")
+                    return render_sql_result(db_env, cached_sql, sql_res)
+                question_cache.invalidate(query, db_env.mschema_hash)
+
+        with span("schema_prompt"):
+            mschema_str = await asyncio.to_thread(db_env.get_mschema_str, query)
+        prompt = f"""你现在是一名{db_env.dialect}数据分析专家，你的任务是根据参考的数据库schema和用户的问题，编写正确的SQL来回答用户的问题，生成的SQL用```sql 和```包围起来。
 【数据库schema】
-{db_env.mschema_str}
+{mschema_str}
 
 【问题】
 {query}
 """
-    #logger.info(f"SQL generation prompt: {prompt}")
-
-    messages = [
-        {"role": "system", "content": prompt},
-        {"role": "user", "content": f"用户的问题是: {query}"}
-    ]
-    param = {"model": model_config['name'], "messages": messages,"key":model_key,"url":model_config['url']}
-
-    try:
-        response = call_dashscope(**param)
-        content = response.choices[0].message.content
-        sql_query = extract_sql_from_qwen(content)
-        status, res = db_env.database.fetch(sql_query)
+        #logger.info(f"SQL generation prompt: {prompt}")
+
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": f"用户的问题是: {query}"}
+        ]
+        config = model_config()
+        param = {"model": config['name'], "messages": messages,"key":config['key'],"url":config['url'],
+                 "timeout":config['timeout'],"max_retries":config['max_retries']}
+
+        sql_query = push_down_limit(await generate_sql(param), MAX_RESULT_ROWS, db_env.dialect)
+        # 校验和取结果共用同一次执行，本地校验失败时不会访问数据库
+        status, sql_res = await execute_sql(db_env, sql_query)
         if not status:
             for idx in range(3):
-                sql_query = sql_fix(db_env.dialect, db_env.mschema_str, query, sql_query, res)
-                status, res = db_env.database.fetch(sql_query)
+                inc("xiyan_sql_fix_rounds_total")
+                with span("sql_fix", round=idx + 1):
+                    status, sql_query, sql_res = await speculative_sql_fix(db_env, mschema_str, query, sql_query,
+                                                                           sql_res["truncated_results"], sql_fix_candidates)
                 if status:
                     break
 
-        sql_res = db_env.database.fetch_truncated(sql_query,max_rows=100)
-        markdown_res = db_env.database.trunc_result_to_markdown(sql_res)
-        logger.info(f"SQL query: {sql_query}\nSQL result: {markdown_res}")
-        return markdown_res
+        inc("xiyan_requests_total", status="success" if status else "failed")
+        if status and question_cache is not None:
+            question_cache.put(query, db_env.mschema_hash, sql_query)
+        return render_sql_result(db_env, sql_query, sql_res)
 
     except Exception as e:
         return str(e)
 
 
-def sql_fix(dialect: str, mschema: str, query: str, sql_query: str, error_info: str):
+async def speculative_sql_fix(db_env, mschema_str: str, query: str, sql_query: str, error_info: str,
+                              num_candidates: int = 1):
+    """
+    并发请求 num_candidates 个修复后的 SQL，各自生成后立即执行校验，
+    第一个执行成功的候选胜出，其余仍在进行的 LLM 请求和排队中的执行被取消。
+    返回 (status, sql_query, sql_res)，全部失败时返回第一个失败的候选。
+    """
+    seen = set()
+
+    async def fix_candidate(idx: int):
+        temperature = None if idx == 0 else sql_fix_temperature
+        candidate = await sql_fix(db_env.dialect, mschema_str, query, sql_query, error_info, temperature=temperature)
+        candidate = push_down_limit(candidate, MAX_RESULT_ROWS, db_env.dialect)
+        if candidate in seen:
+            # 与其他候选相同，无需重复执行
+            return None
+        seen.add(candidate)
+        status, sql_res = await execute_sql(db_env, candidate)
+        return status, candidate, sql_res
+
+    tasks = [asyncio.create_task(fix_candidate(idx)) for idx in range(num_candidates)]
+    failure, error = None, None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                result = await next_done
+            except Exception as e:
+                error = e
+                continue
+            if result is None:
+                continue
+            if result[0]:
+                return result
+            if failure is None:
+                failure = result
+    finally:
+        for task in tasks:
+            task.cancel()
+    if failure is None and error is not None:
+        raise error
+    return failure
+
+
+def render_sql_result(db_env, sql_query: str, sql_res: dict) -> str:
+    with span("render"):
+        markdown_res = db_env.database.trunc_result_to_markdown(sql_res)
+    logger.info(f"SQL query: {sql_query}\nSQL result: {markdown_res}")
+    return markdown_res
+
+
+async def sql_fix(dialect: str, mschema: str, query: str, sql_query: str, error_info: str, temperature: float = None):
     system_prompt = '''现在你是一个{dialect}数据分析专家，需要阅读一个客户的问题，参考的数据库schema，该问题对应的待检查SQL，以及执行该SQL时数据库返回的语法错误，请你仅针对其中的语法错误进行修复，输出修复后的SQL。
 注意：
 1、仅修复语法错误，不允许改变SQL的逻辑。
@@ -151,54 +518,133 @@ def sql_fix(dialect: str, mschema: str, query: str, sql_query: str, error_info:
 【错误信息】
 {sql_res}'''.format(question=query, sql=sql_query, sql_res=error_info)
 
-    model = model_name
+    config = model_config()
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
-    param = {"model": model, "messages": messages,"key":model_key,'url':model_config['url']}
+    param = {"model": config['name'], "messages": messages,"key":config['key'],'url':config['url'],
+             'timeout':config['timeout'],'max_retries':config['max_retries']}
+    if temperature is not None:
+        param['temperature'] = temperature
 
-    response = call_dashscope(**param)
-    content = response.choices[0].message.content
-    sql_query = extract_sql_from_qwen(content)
+    sql_query = await generate_sql(param, stop_at_first_block=False)
 
     return sql_query
 
-def call_xiyan(query: str)-> str:
+async def call_xiyan(query: str, database: str = None)-> str:
     """Fetch the data from database through a natural language query
 
     Args:
         query: The query in natual language
+        database: Name of the configured database, the default database when empty
     """
-    db_config = get_db_config()
-    xiyan_config = get_xiyan_config(db_config)
+    try:
+        xiyan_config = db_registry().get(database)
+    except KeyError as e:
+        return str(e.args[0])
 
-    logger.info(f"Calling tool with arguments: {query}")
+    logger.info(f"Calling tool with arguments: {query}, database: {database or db_registry().default}")
     try:
-        db_engine = init_db_conn(xiyan_config)
-        db_source = HITLSQLDatabase(db_engine)
+        with span("get_db_source"):
+            db_source = await run_in_db_thread(get_db_source, xiyan_config)
     except Exception as  e:
 
         return "数据库连接失败"+str(e)
     logger.info(f"Calling xiyan")
-    env = DataBaseEnv(db_source)
-    res = sql_gen_and_execute(env,query)
+    env = DataBaseEnv(db_source, link_top_k=schema_link_top_k, link_min_tables=schema_link_min_tables,
+                      embed_fn=embed_texts if schema_link_embedding_model else None, render_seed=mschema_render_seed)
+    res = await sql_gen_and_execute(env,query)
 
     return str(res)
 @mcp.tool()
-def get_data_via_natual_language(query: str)-> list[TextContent]:
+async def get_data_via_natual_language(query: str, database: str = "")-> list[TextContent]:
     """Fetch the data from database through a natural language query
 
     Args:
         query: The query in natual language
+        database: Optional name of the database to query (see list_databases), the default database when empty
     """
 
-    res=call_xiyan(query)
+    with trace_util.trace("request", question=query, database=database or db_registry().default):
+        res=await call_xiyan(query, database or None)
     return [TextContent(type="text", text=res)]
 
 
+@mcp.tool()
+async def list_databases()-> list[TextContent]:
+    """List the databases that can be queried, the first one is the default"""
+    registry = db_registry()
+    names = [registry.default] + [name for name in registry.names() if name != registry.default]
+    lines = [f"{name} ({registry.get(name).dialect})" for name in names]
+    return [TextContent(type="text", text="\n".join(lines))]
 
-if __name__ == "__main__":
 
+@mcp.tool()
+async def refresh_schema(database: str = "")-> list[TextContent]:
+    """Pick up table changes (DDL) of a database, only added, altered or dropped tables are re-read
+
+    Args:
+        database: Optional name of the database to refresh, the default database when empty
+    """
+    try:
+        xiyan_config = db_registry().get(database or None)
+    except KeyError as e:
+        return [TextContent(type="text", text=str(e.args[0]))]
+    with span("refresh_schema"):
+        db_source = await run_in_db_thread(get_db_source, xiyan_config)
+        changes = await run_in_db_thread(refresh_db_source, db_source, xiyan_config)
+    text_res = "\n".join(f"{kind}: {', '.join(tables) if tables else '-'}" for kind, tables in changes.items())
+    return [TextContent(type="text", text=text_res)]
+
+
+@mcp.tool()
+async def preview_table(table_name: str, database: str = "", columns: str = "", cursor: str = "",
+                        limit: int = 0)-> list[TextContent]:
+    """Browse the rows of a table page by page, in primary key order
+
+    Args:
+        table_name: Name of the table
+        database: Optional name of the database, the default database when empty
+        columns: Optional comma separated columns to return, all columns when empty
+        cursor: Optional next_cursor printed at the end of the previous page, the first page when empty
+        limit: Optional rows per page, capped by the server page size
+    """
+    try:
+        xiyan_config = db_registry().get(database or None)
+    except KeyError as e:
+        return [TextContent(type="text", text=str(e.args[0]))]
+    column_names = [c.strip() for c in columns.split(",") if c.strip()] or None
+    limit = min(limit, preview_page_size) if limit > 0 else preview_page_size
+    with span("preview_table"):
+        try:
+            text_res = await run_in_db_thread(read_table_rows, table_name, xiyan_config, column_names, cursor or None,
+                                              limit)
+        except (SQLAlchemyError, ValueError) as e:
+            text_res = str(e)
+    return [TextContent(type="text", text=text_res)]
+
+
+@mcp.resource("xiyan://metrics")
+async def read_metrics() -> str:
+    """Prometheus text format metrics of the NL-to-SQL pipeline."""
+    return trace_util.render_prometheus()
+
+
+@mcp.resource("xiyan://traces")
+async def read_traces() -> str:
+    """Per-stage timings of the most recent requests."""
+    return json.dumps(trace_util.recent_traces(), ensure_ascii=False, indent=2)
+
+
+
+def serve():
+    """启动服务，默认库的 mysql:// 资源名依赖数据库配置，在启动时而非 import 时注册"""
+    mcp.resource('mysql://' + db_registry().default)(read_default_schema)
     mcp.run()
 
+
+if __name__ == "__main__":
+
+    serve()
+
@@ -0,0 +1,38 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+DEFAULT_DB_MAX_WORKERS = 8
+
+_db_executor: Optional[ThreadPoolExecutor] = None
+_db_max_workers = DEFAULT_DB_MAX_WORKERS
+_db_executor_lock = threading.Lock()
+
+
+def set_db_max_workers(max_workers: int):
+    """设置数据库线程池大小，需在第一次 run_in_db_thread 之前调用"""
+    global _db_max_workers
+    _db_max_workers = max(int(max_workers), 1)
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """所有阻塞的数据库操作（建连、内省、执行 SQL）共用的有界线程池"""
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is None:
+            _db_executor = ThreadPoolExecutor(max_workers=_db_max_workers, thread_name_prefix="xiyan-db")
+        return _db_executor
+
+
+async def run_in_db_thread(func: Callable, *args, **kwargs) -> Any:
+    """
+    在数据库线程池中执行阻塞函数，不占用事件循环
+    协程被取消时，尚未开始执行的任务会从队列中移除，CancelledError 继续向上传播
+    与 asyncio.to_thread 一样复制当前 context，线程中的 trace span 归属到发起请求的链路
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(ctx.run, func, *args, **kwargs))
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    线程安全的 LRU + TTL 缓存
+    max_size: 最多保留的条目数，超过后淘汰最久未使用的条目，None 表示不限制
+    ttl: 条目存活秒数，None 表示永不过期
+    max_cost: 所有条目 cost 之和的上限（如按字节估算的内存预算），None 表示不限制
+    """
+    def __init__(self, max_size: Optional[int] = 128, ttl: Optional[float] = None, max_cost: Optional[int] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_cost = max_cost
+        self.total_cost = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self._key_locks = {}
+
+    def _expired(self, expire_at: Optional[float]) -> bool:
+        return expire_at is not None and expire_at <= time.monotonic()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expire_at, _ = item
+            if self._expired(expire_at):
+                self._pop(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, cost: int = 1) -> bool:
+        """写入条目，单个条目的 cost 超过 max_cost 时不缓存并返回 False"""
+        ttl = self.ttl if ttl is None else ttl
+        expire_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._pop(key)
+            if self.max_cost is not None and cost > self.max_cost:
+                return False
+            self._data[key] = (value, expire_at, cost)
+            self.total_cost += cost
+            while self._data and ((self.max_size is not None and len(self._data) > self.max_size) or
+                                  (self.max_cost is not None and self.total_cost > self.max_cost)):
+                self._pop(next(iter(self._data)))
+            return True
+
+    def _pop(self, key: Hashable) -> Optional[tuple]:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.total_cost -= item[2]
+        return item
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        命中则直接返回，否则调用 factory 构建并写入缓存。
+        同一个 key 的并发构建会被串行化，避免重复构建。
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._key_lock(key):
+            value = self.get(key)
+            if value is None:
+                value = factory()
+                self.set(key, value, ttl)
+        return value
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def items(self) -> list:
+        """返回未过期条目的快照 [(key, value)]，不影响 LRU 顺序"""
+        with self._lock:
+            return [(key, value) for key, (value, expire_at, _) in self._data.items() if not self._expired(expire_at)]
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._pop(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_cost = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
@@ -1,5 +1,6 @@
 import re
 import os
+import threading
 import datetime, decimal
 from sqlalchemy import create_engine, MetaData, Table, Column, String, Integer, select, text
 from sqlalchemy.engine import Engine
@@ -7,29 +8,62 @@ from config.db_config import DBConfig
 
 
 def init_db_conn(db_config: DBConfig) -> Engine:
+    engine_kwargs = {
+        "pool_pre_ping": db_config.pool_pre_ping,
+        "pool_recycle": db_config.pool_recycle,
+    }
     if db_config.dialect.lower() == 'sqlite':
-        return connect_to_sqlite(db_config.db_path)
-    elif db_config.dialect.lower() == 'mysql':
-        return connect_to_mysql(db_config.db_name, db_config.user_name, db_config.db_pwd, db_config.db_host, db_config.port)
+        return connect_to_sqlite(db_config.db_path, **engine_kwargs)
+    engine_kwargs["pool_size"] = db_config.pool_size
+    engine_kwargs["max_overflow"] = db_config.max_overflow
+    if db_config.dialect.lower() == 'mysql':
+        return connect_to_mysql(db_config.db_name, db_config.user_name, db_config.db_pwd, db_config.db_host, db_config.port, **engine_kwargs)
     elif db_config.dialect.lower() == 'postgresql':
-        return connect_to_pg(db_config.db_name, db_config.user_name, db_config.db_pwd, db_config.db_host, db_config.port)
+        return connect_to_pg(db_config.db_name, db_config.user_name, db_config.db_pwd, db_config.db_host, db_config.port, **engine_kwargs)
     else:
         raise NotImplementedError
 
 
-def connect_to_sqlite(db_path: str) -> Engine:
+_engine_registry = {}
+_engine_registry_lock = threading.Lock()
+
+
+def get_engine(db_config: DBConfig) -> Engine:
+    """
+    按 DBConfig 复用长生命周期的连接池 Engine，工具调用、资源读取和 HITLSQLDatabase 共用同一个连接池
+    """
+    key = db_config.cache_key()
+    with _engine_registry_lock:
+        engine = _engine_registry.get(key)
+        if engine is None:
+            engine = init_db_conn(db_config)
+            _engine_registry[key] = engine
+        return engine
+
+
+def dispose_engine(db_config: DBConfig) -> bool:
+    """关闭并移除某个数据库的连接池，下次 get_engine 时重新创建"""
+    with _engine_registry_lock:
+        engine = _engine_registry.pop(db_config.cache_key(), None)
+    if engine is None:
+        return False
+    engine.dispose()
+    return True
+
+
+def connect_to_sqlite(db_path: str, **engine_kwargs) -> Engine:
     assert os.path.exists(db_path)
-    db_engine = create_engine(f'sqlite:///{os.path.abspath(db_path)}')
+    db_engine = create_engine(f'sqlite:///{os.path.abspath(db_path)}', **engine_kwargs)
     return db_engine
 
 
-def connect_to_mysql(db_name, user_name, db_pwd, db_host, port) -> Engine:
-    db_engine = create_engine(f"mysql+pymysql://{user_name}:{db_pwd}@{db_host}:{port}/{db_name}")
+def connect_to_mysql(db_name, user_name, db_pwd, db_host, port, **engine_kwargs) -> Engine:
+    db_engine = create_engine(f"mysql+pymysql://{user_name}:{db_pwd}@{db_host}:{port}/{db_name}", **engine_kwargs)
     return db_engine
 
 
-def connect_to_pg(db_name, user_name, db_pwd, db_host, port) -> Engine:
-    db_engine = create_engine(f"postgresql+psycopg2://{user_name}:{db_pwd}@{db_host}:{port}/{db_name}")
+def connect_to_pg(db_name, user_name, db_pwd, db_host, port, **engine_kwargs) -> Engine:
+    db_engine = create_engine(f"postgresql+psycopg2://{user_name}:{db_pwd}@{db_host}:{port}/{db_name}", **engine_kwargs)
     return db_engine
 
 
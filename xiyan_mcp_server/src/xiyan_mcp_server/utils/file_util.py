@@ -1,7 +1,6 @@
 # -*- coding: UTF-8 -*-
 import json
 import os
-import pandas as pd
 import re
 
 def extract_sql_from_qwen(qwen_result) -> str:
@@ -16,6 +15,49 @@ def extract_sql_from_qwen(qwen_result) -> str:
 
     return sql
 
+class SQLBlockScanner:
+    """
+    流式输出的增量扫描器，逐段 feed 模型输出，第一个 ```sql 代码块闭合时返回其中的 SQL
+    只从上次扫描的位置继续查找，不会重复扫描已读过的文本
+    """
+    START = "```sql"
+    END = "```"
+
+    def __init__(self):
+        self._chunks = []
+        self._buffer = ''
+        self._scan_pos = 0
+        self._sql_start = None
+        self.sql = None
+
+    def feed(self, chunk: str):
+        """追加一段输出，代码块已闭合时返回 SQL，否则返回 None；闭合之后的输出仍会记录到 text 中"""
+        if not chunk:
+            return self.sql
+        self._chunks.append(chunk)
+        if self.sql is not None:
+            return self.sql
+        self._buffer += chunk
+        if self._sql_start is None:
+            idx = self._buffer.find(self.START, self._scan_pos)
+            if idx == -1:
+                # 保留可能被切断的起始标记
+                self._scan_pos = max(len(self._buffer) - len(self.START) + 1, 0)
+                return None
+            self._sql_start = idx + len(self.START)
+            self._scan_pos = self._sql_start
+        idx = self._buffer.find(self.END, self._scan_pos)
+        if idx == -1:
+            self._scan_pos = max(len(self._buffer) - len(self.END) + 1, self._sql_start)
+            return None
+        self.sql = self._buffer[self._sql_start:idx].strip()
+        return self.sql
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._chunks)
+
+
 def read_text(filename)->list:
     data = []
     with open(filename, 'r', encoding='utf-8') as file:
@@ -59,6 +101,7 @@ def write_json_to_file(path: str, data: list, is_json_line: bool = False) -> Non
 
 
 def save_as_csv(path: str, data: list):
+    import pandas as pd    # 只有导出 CSV 时用到，避免启动时加载 pandas
     valid_path(path)
     df = pd.DataFrame(data)
     df.to_csv(path, index=False, encoding='utf-8')
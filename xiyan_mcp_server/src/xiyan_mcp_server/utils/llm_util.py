@@ -1,17 +1,131 @@
-from openai import OpenAI
+import importlib.util
+import threading
+from typing import TYPE_CHECKING
+
+import httpx
+
+from utils.file_util import SQLBlockScanner, extract_sql_from_qwen
+from utils.trace_util import inc
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MAX_RETRIES = 2
+
+_clients = {}
+_async_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _http_client_kwargs(timeout: float) -> dict:
+    # 依赖 httpx[http2] 启用 HTTP/2，多个请求复用同一条连接；未装 h2 的源码环境退回 HTTP/1.1
+    return {
+        "http2": importlib.util.find_spec("h2") is not None,
+        "timeout": httpx.Timeout(timeout, connect=min(timeout, 10.0)),
+        "limits": httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0),
+    }
+
+
+def get_llm_client(key: str, url: str, timeout: float = DEFAULT_TIMEOUT,
+                   max_retries: int = DEFAULT_MAX_RETRIES) -> 'OpenAI':
+    """
+    按 (url, key) 复用 OpenAI 兼容客户端及其 HTTP 连接池，
+    生成和 sql_fix 的多轮调用都走同一组 keep-alive 连接
+    """
+    with _clients_lock:
+        client = _clients.get((url, key))
+        if client is None:
+            # openai 导入较慢，首次调用模型时才导入，缩短服务启动时间
+            from openai import OpenAI
+            client = OpenAI(
+                api_key=key,
+                base_url=url,
+                timeout=timeout,
+                max_retries=max_retries,
+                http_client=httpx.Client(**_http_client_kwargs(timeout)),
+            )
+            _clients[(url, key)] = client
+        return client
+
+
+def get_async_llm_client(key: str, url: str, timeout: float = DEFAULT_TIMEOUT,
+                         max_retries: int = DEFAULT_MAX_RETRIES) -> 'AsyncOpenAI':
+    """get_llm_client 的异步版本"""
+    with _clients_lock:
+        client = _async_clients.get((url, key))
+        if client is None:
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(
+                api_key=key,
+                base_url=url,
+                timeout=timeout,
+                max_retries=max_retries,
+                http_client=httpx.AsyncClient(**_http_client_kwargs(timeout)),
+            )
+            _async_clients[(url, key)] = client
+        return client
+
+
+def _pop_client_args(args: dict) -> tuple:
+    key = args.pop('key')
+    url = args.pop('url')
+    max_retries = args.pop('max_retries', DEFAULT_MAX_RETRIES)
+    timeout = args.get('timeout', DEFAULT_TIMEOUT)
+    return key, url, timeout, max_retries
 
 
 def call_dashscope(**args):
-    key = args['key']
-    base_url = args['url']
-    client = OpenAI(
-        api_key=key,
-        base_url=base_url,
-    )
-    del args['key']
-    del args['url']
+    key, base_url, timeout, max_retries = _pop_client_args(args)
+    client = get_llm_client(key, base_url, timeout, max_retries)
     completion = client.chat.completions.create(
         **args
     )
+    record_usage(completion)
     return completion
 
+
+def record_usage(completion):
+    usage = getattr(completion, 'usage', None)
+    if usage is not None:
+        inc("xiyan_llm_tokens_total", usage.prompt_tokens or 0, type="prompt")
+        inc("xiyan_llm_tokens_total", usage.completion_tokens or 0, type="completion")
+
+
+async def acall_dashscope(**args):
+    key, base_url, timeout, max_retries = _pop_client_args(args)
+    client = get_async_llm_client(key, base_url, timeout, max_retries)
+    completion = await client.chat.completions.create(
+        **args
+    )
+    record_usage(completion)
+    return completion
+
+
+async def astream_dashscope_sql(stop_at_first_block: bool = True, **args) -> str:
+    """
+    流式生成并增量扫描输出，```sql 代码块一闭合就返回其中的 SQL 并关闭连接，
+    不再等待和接收代码块之后的解释文字；没有闭合的代码块时按完整输出提取 SQL
+    stop_at_first_block=False 时读完整个输出，与 extract_sql_from_qwen 一样返回最后一个代码块
+    """
+    key, base_url, timeout, max_retries = _pop_client_args(args)
+    client = get_async_llm_client(key, base_url, timeout, max_retries)
+    # 读完的流在最后一个块中带回 usage，计入 xiyan_llm_tokens_total
+    args.setdefault('stream_options', {"include_usage": True})
+    stream = await client.chat.completions.create(stream=True, **args)
+    scanner = SQLBlockScanner()
+    try:
+        async for chunk in stream:
+            record_usage(chunk)
+            if not chunk.choices:
+                continue
+            inc("xiyan_llm_stream_chunks_total")
+            sql = scanner.feed(chunk.choices[0].delta.content or '')
+            if sql is not None and stop_at_first_block:
+                # 提前断开的流拿不到 usage，只能从 xiyan_llm_stream_chunks_total 估算输出量
+                inc("xiyan_llm_streams_stopped_early_total")
+                return sql
+    finally:
+        # 提前返回或任务被取消时关闭响应，服务端随之停止生成
+        await stream.close()
+    return extract_sql_from_qwen(scanner.text)
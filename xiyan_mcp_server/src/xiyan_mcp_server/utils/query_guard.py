@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# SQLite 每执行多少条虚拟机指令检查一次超时和取消
+SQLITE_PROGRESS_STEPS = 10000
+
+
+class QueryTimeoutError(Exception):
+    pass
+
+
+class QueryCostError(Exception):
+    pass
+
+
+class QueryCanceller:
+    """
+    记录某个线程中正在执行查询的连接，其他线程（如被取消的协程）调用 cancel 时
+    让数据库中断该查询，执行线程随即收到错误并把连接归还连接池
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connection: Optional[Connection] = None
+        self.cancelled = False
+
+    def attach(self, connection: Connection):
+        with self._lock:
+            self._connection = connection
+            cancelled = self.cancelled
+        if cancelled:
+            raise QueryTimeoutError("Query cancelled by client")
+
+    def detach(self):
+        with self._lock:
+            self._connection = None
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            connection = self._connection
+        if connection is None:
+            return
+        try:
+            interrupt_query(connection)
+        except Exception:
+            pass
+
+
+def _dbapi_connection(connection: Connection):
+    return connection.connection.dbapi_connection
+
+
+def interrupt_query(connection: Connection):
+    """从其他线程中断连接上正在执行的查询"""
+    dialect = connection.dialect.name
+    dbapi_connection = _dbapi_connection(connection)
+    if dialect == 'sqlite':
+        dbapi_connection.interrupt()
+    elif dialect == 'postgresql':
+        dbapi_connection.cancel()
+    elif dialect == 'mysql':
+        thread_id = dbapi_connection.thread_id()
+        with connection.engine.connect() as killer:
+            killer.execute(text(f"KILL QUERY {int(thread_id)}"))
+
+
+@contextmanager
+def statement_timeout(connection: Connection, timeout: Optional[float], canceller: Optional[QueryCanceller] = None):
+    """
+    在当前连接上设置语句超时，退出时恢复，连接可以安全地归还连接池
+    mysql: SESSION MAX_EXECUTION_TIME（只作用于 SELECT），退出时恢复为 DEFAULT
+    postgresql: SET LOCAL statement_timeout，随事务结束自动失效
+    sqlite: progress handler 到时中断，同时响应 canceller 的取消
+    """
+    dialect = connection.dialect.name
+    if canceller is not None:
+        canceller.attach(connection)
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        if dialect == 'sqlite':
+            if deadline is not None or canceller is not None:
+                def should_interrupt():
+                    return int((deadline is not None and time.monotonic() > deadline)
+                               or (canceller is not None and canceller.cancelled))
+                _dbapi_connection(connection).set_progress_handler(should_interrupt, SQLITE_PROGRESS_STEPS)
+        elif timeout:
+            if dialect == 'mysql':
+                connection.execute(text(f"SET SESSION MAX_EXECUTION_TIME = {int(timeout * 1000)}"))
+            elif dialect == 'postgresql':
+                connection.execute(text(f"SET LOCAL statement_timeout = {int(timeout * 1000)}"))
+        try:
+            yield connection
+        except Exception as e:
+            if canceller is not None and canceller.cancelled:
+                raise QueryTimeoutError("Query cancelled by client") from e
+            if deadline is not None and time.monotonic() > deadline:
+                raise QueryTimeoutError(f"Query cancelled: exceeded the statement timeout of {timeout}s") from e
+            raise
+    finally:
+        if canceller is not None:
+            canceller.detach()
+        if dialect == 'sqlite':
+            if deadline is not None or canceller is not None:
+                _dbapi_connection(connection).set_progress_handler(None, 0)
+        elif timeout and dialect == 'mysql':
+            try:
+                # 恢复为全局默认值，不覆盖服务端配置的 max_execution_time
+                connection.execute(text("SET SESSION MAX_EXECUTION_TIME = DEFAULT"))
+            except Exception:
+                # 连接已不可用时交给连接池丢弃
+                connection.invalidate()
+
+
+def _find_numbers(node, key: str) -> list:
+    values = []
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k == key:
+                try:
+                    values.append(float(v))
+                except (TypeError, ValueError):
+                    pass
+            else:
+                values.extend(_find_numbers(v, key))
+    elif isinstance(node, list):
+        for item in node:
+            values.extend(_find_numbers(item, key))
+    return values
+
+
+def _plan_nodes(node: dict):
+    """遍历 PostgreSQL EXPLAIN (FORMAT JSON) 计划树中的全部节点"""
+    yield node
+    for child in node.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def _is_scan_or_join(node: dict) -> bool:
+    node_type = node.get('Node Type', '')
+    return node_type.endswith('Scan') or node_type.endswith('Join') or node_type == 'Nested Loop'
+
+
+def estimate_query_cost(connection: Connection, sql_query: str) -> Tuple[Optional[float], Optional[float]]:
+    """
+    通过 EXPLAIN 获取优化器估算的 (行数, 代价)，不执行查询；方言不提供估算时返回 None
+    行数按扫描的行数衡量，而不是最终返回的行数：生成的 SQL 都经过 push_down_limit，根节点通常是 LIMIT
+    mysql: EXPLAIN FORMAT=JSON 中的 query_cost 和 rows_produced_per_join/rows_examined_per_scan 的最大值
+    postgresql: EXPLAIN (FORMAT JSON) 中扫描和连接节点 Plan Rows 的最大值，以及根节点的 Total Cost
+    sqlite: 查询计划不包含代价估算，不做限制
+    """
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        plan = json.loads(connection.execute(text(f"EXPLAIN FORMAT=JSON {sql_query}")).scalar())
+        costs = _find_numbers(plan, 'query_cost')
+        rows = _find_numbers(plan, 'rows_produced_per_join') + _find_numbers(plan, 'rows_examined_per_scan')
+        return (max(rows) if rows else None), (max(costs) if costs else None)
+    if dialect == 'postgresql':
+        plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql_query}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]['Plan']
+        nodes = [node for node in _plan_nodes(root) if _is_scan_or_join(node)] or [root]
+        return max(float(node['Plan Rows']) for node in nodes), float(root['Total Cost'])
+    return None, None
+
+
+def check_query_cost(connection: Connection, sql_query: str, max_rows: Optional[float] = None,
+                     max_cost: Optional[float] = None):
+    """估算行数或代价超过上限时抛出 QueryCostError，查询不会被执行"""
+    if max_rows is None and max_cost is None:
+        return
+    rows, cost = estimate_query_cost(connection, sql_query)
+    if max_rows is not None and rows is not None and rows > max_rows:
+        raise QueryCostError(f"Query rejected before execution: estimated {rows:.0f} rows exceeds the limit of "
+                             f"{max_rows:.0f}, add filters or aggregation to reduce the scanned rows")
+    if max_cost is not None and cost is not None and cost > max_cost:
+        raise QueryCostError(f"Query rejected before execution: estimated cost {cost:.1f} exceeds the limit of "
+                             f"{max_cost:.1f}, add filters, join conditions or aggregation")
@@ -0,0 +1,134 @@
+import atexit
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+from utils.cache_util import TTLCache
+from utils.file_util import read_json_file, write_json_to_file
+
+
+def normalize_question(question: str) -> str:
+    """全半角统一、小写、去掉标点并合并空白，使措辞上的细微差异命中同一条缓存"""
+    question = unicodedata.normalize('NFKC', question).lower()
+    question = ''.join(' ' if unicodedata.category(ch).startswith('P') else ch for ch in question)
+    return re.sub(r'\s+', ' ', question).strip()
+
+
+# 问题中的数字、中文数字和引号内的文本，近似匹配时必须完全相同
+_LITERAL_PATTERN = re.compile(r'"[^"]*"|\'[^\']*\'|“[^”]*”|‘[^’]*’|「[^」]*」|《[^》]*》|\d+(?:\.\d+)?|[零〇一二两三四五六七八九十百千万亿]+')
+
+
+def literal_tokens(question: str) -> tuple:
+    """提取问题中的字面量，“2023年”和“2024年”、“top 10”和“top 100”字符相似度很高，但对应的 SQL 不同"""
+    return tuple(_LITERAL_PATTERN.findall(unicodedata.normalize('NFKC', question).lower()))
+
+
+def schema_hash(mschema_str: str) -> str:
+    return hashlib.sha1(mschema_str.encode('utf-8')).hexdigest()[:16]
+
+
+def char_ngrams(text: str, n: int = 2) -> frozenset:
+    text = text.replace(' ', '')
+    if len(text) < n:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+class QuestionSQLCache:
+    """
+    问题到可执行 SQL 的缓存，命中后跳过 LLM 直接执行
+    key 为 (归一化后的问题, M-Schema 哈希)，schema 变化后旧条目自然不再命中
+    similarity_threshold: 设置后对未精确命中的问题按字符 bigram 的 Jaccard 相似度查找近似问题，
+                          数字和引号内的字面量不同的问题不会命中
+    persist_path: 设置后写入会在 persist_delay 秒内合并，由后台线程落盘，启动时自动加载
+    """
+    def __init__(self, max_size: Optional[int] = 1024, ttl: Optional[float] = None,
+                 persist_path: Optional[str] = None, similarity_threshold: Optional[float] = None,
+                 persist_delay: float = 1.0):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.persist_path = persist_path
+        self.similarity_threshold = similarity_threshold
+        self.persist_delay = persist_delay
+        self._persist_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        if persist_path:
+            self.load(persist_path)
+            atexit.register(self.flush)
+
+    def get(self, question: str, mschema_hash: str) -> Optional[str]:
+        normalized = normalize_question(question)
+        entry = self._cache.get((normalized, mschema_hash))
+        if entry is None and self.similarity_threshold:
+            entry = self._most_similar(normalized, literal_tokens(question), mschema_hash)
+        return None if entry is None else entry['sql']
+
+    def _most_similar(self, normalized: str, literals: tuple, mschema_hash: str) -> Optional[dict]:
+        grams = char_ngrams(normalized)
+        if not grams:
+            return None
+        best, best_score = None, self.similarity_threshold
+        for (_, entry_hash), entry in self._cache.items():
+            if entry_hash != mschema_hash or entry['literals'] != literals:
+                continue
+            union = len(grams | entry['grams'])
+            score = len(grams & entry['grams']) / union if union else 0.0
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def set(self, question: str, mschema_hash: str, sql: str, created: Optional[float] = None,
+            literals: Optional[tuple] = None):
+        normalized = normalize_question(question)
+        created = time.time() if created is None else created
+        ttl = None
+        if self._cache.ttl is not None:
+            ttl = self._cache.ttl - (time.time() - created)
+            if ttl <= 0:
+                return
+        entry = {"sql": sql, "created": created, "grams": char_ngrams(normalized),
+                 "literals": literal_tokens(question) if literals is None else tuple(literals)}
+        self._cache.set((normalized, mschema_hash), entry, ttl)
+
+    def put(self, question: str, mschema_hash: str, sql: str):
+        """写入缓存，配置了 persist_path 时安排一次延迟落盘，不阻塞调用方（事件循环）"""
+        self.set(question, mschema_hash, sql)
+        if self.persist_path:
+            with self._persist_lock:
+                if self._save_timer is None:
+                    self._save_timer = threading.Timer(self.persist_delay, self.flush)
+                    self._save_timer.daemon = True
+                    self._save_timer.start()
+
+    def flush(self):
+        """立即写入尚未落盘的修改"""
+        with self._persist_lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is not None:
+            timer.cancel()
+            self.save(self.persist_path)
+
+    def invalidate(self, question: str, mschema_hash: str) -> bool:
+        return self._cache.invalidate((normalize_question(question), mschema_hash))
+
+    def clear(self):
+        self._cache.clear()
+
+    def save(self, path: str):
+        data = [{"question": question, "schema_hash": mschema_hash, "sql": entry['sql'], "created": entry['created'],
+                 "literals": list(entry['literals'])}
+                for (question, mschema_hash), entry in self._cache.items()]
+        with self._save_lock:
+            write_json_to_file(os.path.abspath(path), data, is_json_line=False)
+
+    def load(self, path: str):
+        data = read_json_file(path) or []
+        for item in data:
+            self.set(item['question'], item['schema_hash'], item['sql'], item.get('created'), item.get('literals'))
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -0,0 +1,65 @@
+import threading
+from typing import Any, Hashable, Iterable, Optional
+
+from utils.cache_util import TTLCache
+
+
+def estimate_size(value: Any) -> int:
+    """粗略估算查询结果占用的字节数，用于内存预算"""
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(estimate_size(v) for v in value)
+    if isinstance(value, (str, bytes)):
+        return 49 + len(value)
+    return 32
+
+
+class ResultCache:
+    """
+    已执行 SQL 的结果缓存
+    key 由连接标识和归一化后的 SQL 组成，按估算字节数做 LRU 淘汰，
+    同时记录每条结果引用的表，表数据变化时按表失效
+    """
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: Optional[float] = 60):
+        self._cache = TTLCache(max_size=None, ttl=ttl, max_cost=max_bytes)
+        self._table_index = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        return self._cache.get(key)
+
+    def set(self, key: Hashable, value: Any, conn_id: str, tables: Iterable[str], ttl: Optional[float] = None) -> bool:
+        if not self._cache.set(key, value, ttl, cost=estimate_size(value)):
+            return False
+        with self._lock:
+            for table_name in tables:
+                keys = self._table_index.setdefault((conn_id, table_name.lower()), set())
+                keys.add(key)
+                if len(keys) > 1024:
+                    # 清理已被 LRU 淘汰的 key，避免索引无限增长
+                    keys.intersection_update(k for k, _ in self._cache.items())
+        return True
+
+    def invalidate_tables(self, conn_id: str, tables: Iterable[str]) -> int:
+        """使引用了这些表的缓存结果全部失效，返回失效的条目数"""
+        count = 0
+        with self._lock:
+            keys = set()
+            for table_name in tables:
+                keys |= self._table_index.pop((conn_id, table_name.lower()), set())
+        for key in keys:
+            count += self._cache.invalidate(key)
+        return count
+
+    def clear(self):
+        self._cache.clear()
+        with self._lock:
+            self._table_index.clear()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._cache.total_cost
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -0,0 +1,231 @@
+import re
+from typing import List, NamedTuple
+
+
+class SQLToken(NamedTuple):
+    kind: str    # word / quoted / string / number / param / op / comment / space
+    value: str
+    depth: int   # 所在的括号嵌套层数，0 表示语句最外层
+
+
+_SPACE_RE = re.compile(r'\s+')
+_WORD_RE = re.compile(r'[^\W\d]\w*|\$\w+', re.UNICODE)
+_NUMBER_RE = re.compile(r'(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+_PARAM_RE = re.compile(r'[:@]{1,2}\w+|\?|%s|%\(\w+\)s')
+_DOLLAR_QUOTE_RE = re.compile(r'\$(\w*)\$')
+_OPERATORS = ['<=>', '::', '<=', '>=', '<>', '!=', '||', '->>', '->', '#>>', '#>']
+
+
+def tokenize_sql(sql: str, dialect: str = 'mysql') -> List[SQLToken]:
+    """
+    按方言把 SQL 切分成 token，正确处理字符串、引号标识符、注释和括号层级
+    mysql: `ident`，单/双引号都是字符串，支持反斜杠转义
+    postgresql/sqlite: "ident"，单引号为字符串，postgresql 额外支持 $$...$$
+    """
+    dialect = (dialect or '').lower()
+    ident_quotes = {'`': '`'} if dialect == 'mysql' else {'"': '"', '`': '`'}
+    if dialect == 'sqlite':
+        ident_quotes['['] = ']'
+    string_quotes = "'\"" if dialect == 'mysql' else "'"
+    backslash_escape = dialect == 'mysql'
+
+    tokens = []
+    depth = 0
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch.isspace():
+            m = _SPACE_RE.match(sql, i)
+            tokens.append(SQLToken('space', m.group(), depth))
+            i = m.end()
+        elif sql.startswith('--', i) or (ch == '#' and dialect == 'mysql'):
+            end = sql.find('\n', i)
+            end = n if end == -1 else end
+            tokens.append(SQLToken('comment', sql[i:end], depth))
+            i = end
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            tokens.append(SQLToken('comment', sql[i:end], depth))
+            i = end
+        elif ch in string_quotes:
+            end = _scan_quoted(sql, i, ch, backslash_escape)
+            tokens.append(SQLToken('string', sql[i:end], depth))
+            i = end
+        elif ch in ident_quotes:
+            end = _scan_quoted(sql, i, ident_quotes[ch], False)
+            tokens.append(SQLToken('quoted', sql[i:end], depth))
+            i = end
+        elif ch == '$' and dialect == 'postgresql' and _DOLLAR_QUOTE_RE.match(sql, i):
+            tag = _DOLLAR_QUOTE_RE.match(sql, i).group()
+            end = sql.find(tag, i + len(tag))
+            end = n if end == -1 else end + len(tag)
+            tokens.append(SQLToken('string', sql[i:end], depth))
+            i = end
+        elif ch.isdigit() or (ch == '.' and i + 1 < n and sql[i + 1].isdigit()):
+            m = _NUMBER_RE.match(sql, i)
+            tokens.append(SQLToken('number', m.group(), depth))
+            i = m.end()
+        elif _PARAM_RE.match(sql, i) and not sql.startswith('::', i):
+            m = _PARAM_RE.match(sql, i)
+            tokens.append(SQLToken('param', m.group(), depth))
+            i = m.end()
+        elif _WORD_RE.match(sql, i):
+            m = _WORD_RE.match(sql, i)
+            tokens.append(SQLToken('word', m.group(), depth))
+            i = m.end()
+        elif ch == '(':
+            tokens.append(SQLToken('op', ch, depth))
+            depth += 1
+            i += 1
+        elif ch == ')':
+            depth = max(depth - 1, 0)
+            tokens.append(SQLToken('op', ch, depth))
+            i += 1
+        else:
+            op = next((o for o in _OPERATORS if sql.startswith(o, i)), ch)
+            tokens.append(SQLToken('op', op, depth))
+            i += len(op)
+    return tokens
+
+
+def _scan_quoted(sql: str, start: int, close: str, backslash_escape: bool) -> int:
+    """返回引号内容结束后的位置，成对的引号（'' 或 ``）视为转义"""
+    i, n = start + 1, len(sql)
+    while i < n:
+        ch = sql[i]
+        if backslash_escape and ch == '\\':
+            i += 2
+            continue
+        if ch == close:
+            if i + 1 < n and sql[i + 1] == close:
+                i += 2
+                continue
+            return i + 1
+        i += 1
+    return n
+
+
+def significant_tokens(tokens: List[SQLToken]) -> List[SQLToken]:
+    return [t for t in tokens if t.kind not in ('space', 'comment')]
+
+
+def is_keyword(token: SQLToken, *keywords: str) -> bool:
+    return token is not None and token.kind == 'word' and token.value.upper() in keywords
+
+
+def tokens_to_sql(tokens: List[SQLToken]) -> str:
+    return ''.join(t.value for t in tokens)
+
+
+def strip_statement(sql: str, dialect: str = 'mysql') -> List[SQLToken]:
+    """去掉注释以及首尾空白和分号，返回剩余 token"""
+    tokens = [t for t in tokenize_sql(sql, dialect) if t.kind != 'comment']
+    while tokens and (tokens[-1].kind == 'space' or (tokens[-1].kind == 'op' and tokens[-1].value == ';')):
+        tokens.pop()
+    while tokens and tokens[0].kind == 'space':
+        tokens.pop(0)
+    return tokens
+
+
+def is_select_statement(tokens: List[SQLToken]) -> bool:
+    """单条只读查询：以 SELECT/WITH/( 开头，最外层没有分号和写操作关键字"""
+    words = significant_tokens(tokens)
+    if not words:
+        return False
+    first = words[0]
+    if not (is_keyword(first, 'SELECT', 'WITH') or (first.kind == 'op' and first.value == '(')):
+        return False
+    for idx, token in enumerate(words):
+        if token.depth != 0:
+            continue
+        if token.kind == 'op' and token.value == ';':
+            return False
+        if is_keyword(token, 'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'REPLACE', 'INTO', 'CREATE', 'DROP', 'ALTER'):
+            # REPLACE(...)、INSERT(...) 是字符串函数
+            next_token = words[idx + 1] if idx + 1 < len(words) else None
+            if next_token is None or next_token.value != '(':
+                return False
+    return True
+
+
+def push_down_limit(sql: str, max_rows: int, dialect: str = 'mysql') -> str:
+    """
+    为查询注入或收紧最外层 LIMIT，让数据库只计算需要展示的行数
+    - 没有最外层 LIMIT 时追加 LIMIT max_rows（聚合、UNION 的结果同样只展示前 max_rows 行）
+    - 已有 LIMIT 且大于 max_rows 时改为 max_rows，小于等于时保持不变
+    - 非只读查询、FOR UPDATE、FETCH FIRST、参数化 LIMIT 等无法安全改写的情况原样返回
+    """
+    dialect = (dialect or '').lower()
+    if dialect not in ('mysql', 'postgresql', 'sqlite') or max_rows is None or max_rows <= 0:
+        return sql
+    tokens = strip_statement(sql, dialect)
+    if not is_select_statement(tokens):
+        return sql
+
+    top_level = [(idx, t) for idx, t in enumerate(tokens) if t.depth == 0 and t.kind not in ('space', 'comment')]
+    if any(is_keyword(t, 'FETCH', 'FOR', 'LOCK', 'PROCEDURE') for _, t in top_level):
+        return sql
+
+    limit_pos = next((pos for pos in range(len(top_level) - 1, -1, -1) if is_keyword(top_level[pos][1], 'LIMIT')), None)
+    if limit_pos is None:
+        offset_pos = next((pos for pos, (_, t) in enumerate(top_level) if is_keyword(t, 'OFFSET')), None)
+        if offset_pos is not None:
+            if dialect != 'postgresql':
+                return sql
+            # postgresql 允许只写 OFFSET，在其前面插入 LIMIT
+            idx = top_level[offset_pos][0]
+            return tokens_to_sql(tokens[:idx]) + f"LIMIT {max_rows} " + tokens_to_sql(tokens[idx:])
+        return tokens_to_sql(tokens) + f"\nLIMIT {max_rows}"
+
+    args = [t for _, t in top_level[limit_pos + 1:]]
+    if len(args) >= 3 and args[1].kind == 'op' and args[1].value == ',':
+        if dialect == 'postgresql':
+            return sql
+        count_token = args[2]    # LIMIT offset, count
+    elif args:
+        count_token = args[0]
+    else:
+        return sql
+
+    limit_all = is_keyword(count_token, 'ALL') and dialect == 'postgresql'
+    if not limit_all and (count_token.kind != 'number' or not count_token.value.isdigit()
+                          or int(count_token.value) <= max_rows):
+        return sql
+    idx = next(idx for idx, t in top_level[limit_pos + 1:] if t is count_token)
+    tokens[idx] = SQLToken('number', str(max_rows), 0)
+    return tokens_to_sql(tokens)
+
+
+def normalize_sql(sql: str, dialect: str = 'mysql') -> str:
+    """去掉注释和末尾分号、合并空白，字符串和标识符的大小写保持不变"""
+    parts = []
+    for token in strip_statement(sql, dialect):
+        if token.kind == 'space':
+            if parts and parts[-1] != ' ':
+                parts.append(' ')
+        else:
+            parts.append(token.value)
+    return ''.join(parts)
+
+
+def unquote_identifier(value: str) -> str:
+    if len(value) >= 2 and value[0] in '`"[' and value[-1] in '`"]':
+        return value[1:-1]
+    return value
+
+
+def extract_table_names(sql: str, table_names, dialect: str = 'mysql') -> List[str]:
+    """
+    找出 SQL 中引用到的已知表名（如 MSchema.tables），大小写不敏感，
+    列名与表名相同时会被多算进来，用于缓存失效时只会让失效范围偏大
+    """
+    known = {name.lower(): name for name in table_names}
+    found = []
+    for token in tokenize_sql(sql, dialect):
+        if token.kind not in ('word', 'quoted'):
+            continue
+        name = known.get(unquote_identifier(token.value).lower())
+        if name is not None and name not in found:
+            found.append(name)
+    return found
@@ -0,0 +1,210 @@
+from typing import Dict, List, Optional
+
+from utils.sql_util import SQLToken, is_keyword, is_select_statement, significant_tokens, strip_statement, \
+    unquote_identifier
+
+# 表名后面出现这些关键字时，说明没有别名
+_CLAUSE_KEYWORDS = {
+    'WHERE', 'GROUP', 'ORDER', 'HAVING', 'LIMIT', 'OFFSET', 'JOIN', 'INNER', 'LEFT', 'RIGHT', 'FULL', 'CROSS',
+    'OUTER', 'NATURAL', 'STRAIGHT_JOIN', 'ON', 'USING', 'UNION', 'INTERSECT', 'EXCEPT', 'WINDOW', 'FOR', 'LATERAL',
+    'FETCH', 'AS', 'USE', 'FORCE', 'IGNORE', 'TABLESAMPLE', 'WITH', 'SELECT', 'RETURNING', 'INTO', 'SET',
+}
+
+
+def _is_identifier(token: SQLToken) -> bool:
+    return token.kind == 'quoted' or (token.kind == 'word' and token.value.upper() not in _CLAUSE_KEYWORDS)
+
+
+def _is_op(token: Optional[SQLToken], value: str) -> bool:
+    return token is not None and token.kind == 'op' and token.value == value
+
+
+class _TableRefs:
+    """语句中出现的表及其别名，key 均为小写"""
+    def __init__(self):
+        self.aliases: Dict[str, Optional[str]] = {}   # 别名/表名 -> MSchema 中的表名，子查询为 None
+        self.unknown_tables: List[str] = []
+
+
+def _collect_cte_names(words: List[SQLToken]) -> set:
+    """WITH name AS (...) 或 WITH name (col, ...) AS (...)"""
+    names = set()
+    for idx, token in enumerate(words):
+        if not _is_identifier(token):
+            continue
+        prev_token = words[idx - 1] if idx > 0 else None
+        if not (is_keyword(prev_token, 'WITH', 'RECURSIVE') or _is_op(prev_token, ',')):
+            continue
+        nxt = idx + 1
+        if nxt < len(words) and _is_op(words[nxt], '('):
+            depth = words[nxt].depth
+            nxt += 1
+            while nxt < len(words) and not (_is_op(words[nxt], ')') and words[nxt].depth == depth):
+                nxt += 1
+            nxt += 1
+        if nxt + 1 < len(words) and is_keyword(words[nxt], 'AS') and _is_op(words[nxt + 1], '('):
+            names.add(unquote_identifier(token.value).lower())
+    return names
+
+
+def _is_query_from(words: List[SQLToken], idx: int) -> bool:
+    """区分查询中的 FROM 与 EXTRACT(YEAR FROM x)、SUBSTRING(x FROM 2)、IS DISTINCT FROM 等函数语法"""
+    token = words[idx]
+    if is_keyword(token, 'JOIN', 'STRAIGHT_JOIN'):
+        return True
+    if idx > 0 and is_keyword(words[idx - 1], 'DISTINCT'):
+        return False
+    if token.depth == 0:
+        return True
+    for pos in range(idx - 1, -1, -1):
+        if _is_op(words[pos], '(') and words[pos].depth == token.depth - 1:
+            return pos + 1 < len(words) and is_keyword(words[pos + 1], 'SELECT', 'WITH')
+    return False
+
+
+def _skip_parens(words: List[SQLToken], idx: int) -> int:
+    """idx 指向 '('，返回与之匹配的 ')' 之后的位置"""
+    depth = words[idx].depth
+    end = idx + 1
+    while end < len(words) and not (_is_op(words[end], ')') and words[end].depth == depth):
+        end += 1
+    return end + 1
+
+
+def _collect_table_refs(words: List[SQLToken], table_lookup: Dict[str, str], cte_names: set,
+                        schema: Optional[str]) -> _TableRefs:
+    refs = _TableRefs()
+    idx = 0
+    while idx < len(words):
+        token = words[idx]
+        if not is_keyword(token, 'FROM', 'JOIN', 'STRAIGHT_JOIN') or not _is_query_from(words, idx):
+            idx += 1
+            continue
+        depth = token.depth
+        idx += 1
+        while idx < len(words):
+            # 子查询：( SELECT ... ) alias
+            if _is_op(words[idx], '('):
+                idx = _skip_parens(words, idx)
+                table_name = None
+                is_derived = True
+            elif _is_identifier(words[idx]):
+                parts = [unquote_identifier(words[idx].value)]
+                idx += 1
+                while idx + 1 < len(words) and _is_op(words[idx], '.') and _is_identifier(words[idx + 1]):
+                    parts.append(unquote_identifier(words[idx + 1].value))
+                    idx += 2
+                if idx < len(words) and _is_op(words[idx], '('):
+                    # 表值函数：generate_series(...)、json_table(...)、unnest(...)，按子查询处理
+                    idx = _skip_parens(words, idx)
+                    table_name = None
+                    is_derived = True
+                else:
+                    is_derived = False
+                    table_name = parts[-1]
+                    qualifier = parts[-2] if len(parts) > 1 else None
+                    known_schema = qualifier is None or (schema is not None and qualifier.lower() == schema.lower())
+                    if qualifier is None and table_name.lower() == 'dual':
+                        refs.aliases['dual'] = None    # MySQL/Oracle 的伪表
+                    elif table_name.lower() in cte_names:
+                        refs.aliases[table_name.lower()] = None
+                    elif table_name.lower() in table_lookup:
+                        refs.aliases[table_name.lower()] = table_lookup[table_name.lower()]
+                    elif known_schema:
+                        refs.unknown_tables.append('.'.join(parts))
+                        refs.aliases[table_name.lower()] = None
+                    else:
+                        refs.aliases[table_name.lower()] = None
+            else:
+                break
+
+            # 别名：[AS] alias
+            if idx < len(words) and is_keyword(words[idx], 'AS'):
+                idx += 1
+            if idx < len(words) and _is_identifier(words[idx]) and not (idx + 1 < len(words) and _is_op(words[idx + 1], '.')):
+                alias = unquote_identifier(words[idx].value).lower()
+                # 只有 MSchema 中的表才映射，CTE、dual 和未知表的别名不检查字段
+                refs.aliases[alias] = table_lookup.get(table_name.lower()) if not is_derived else None
+                idx += 1
+                # 带列名的别名：AS t(x, y)
+                if idx < len(words) and _is_op(words[idx], '('):
+                    idx = _skip_parens(words, idx)
+            # FROM a, b 形式的多表
+            if idx < len(words) and _is_op(words[idx], ',') and words[idx].depth == depth:
+                idx += 1
+                continue
+            break
+    return refs
+
+
+def validate_sql(sql: str, mschema, dialect: str = 'mysql') -> List[str]:
+    """
+    在本地根据 MSchema 检查生成的 SQL，返回错误信息列表，空列表表示未发现问题
+    只检查能确定的错误：空语句、括号不匹配、不存在的表、限定形式（alias.column）中不存在的字段和别名，
+    以及引号包裹的未限定字段名，避免把正确的 SQL 误判为错误
+    """
+    if not sql or not sql.strip():
+        return ["No SQL statement found in the model output"]
+    tokens = strip_statement(sql, dialect)
+    words = significant_tokens(tokens)
+    balance = 0
+    for token in words:
+        if _is_op(token, '('):
+            balance += 1
+        elif _is_op(token, ')'):
+            balance -= 1
+        if balance < 0:
+            break
+    if balance != 0:
+        return ["Unbalanced parentheses in SQL"]
+    if not is_select_statement(tokens) or not mschema.tables:
+        return []
+
+    table_lookup = {name.lower(): name for name in mschema.tables.keys()}
+    cte_names = _collect_cte_names(words)
+    refs = _collect_table_refs(words, table_lookup, cte_names, mschema.schema)
+    errors = [f"Table '{name}' doesn't exist" for name in refs.unknown_tables]
+    column_lookup = {name: {c.lower() for c in mschema.tables[name]['fields'].keys()} for name in set(refs.aliases.values()) if name}
+
+    select_aliases = set()
+    for idx, token in enumerate(words):
+        if is_keyword(token, 'AS') and idx + 1 < len(words) and _is_identifier(words[idx + 1]):
+            select_aliases.add(unquote_identifier(words[idx + 1].value).lower())
+
+    for idx, token in enumerate(words):
+        if not _is_identifier(token):
+            continue
+        prev_token = words[idx - 1] if idx > 0 else None
+        next_token = words[idx + 1] if idx + 1 < len(words) else None
+        if _is_op(next_token, '.') or _is_op(next_token, '('):
+            continue
+        name = unquote_identifier(token.value)
+        if _is_op(prev_token, '.'):
+            if idx < 2 or not _is_identifier(words[idx - 2]):
+                continue
+            if idx >= 4 and _is_op(words[idx - 3], '.'):
+                continue    # schema.table.column 形式
+            qualifier = unquote_identifier(words[idx - 2].value)
+            before = words[idx - 3] if idx >= 3 else None
+            if before is not None and (is_keyword(before, 'FROM', 'JOIN', 'AS') or _is_op(before, '::')):
+                continue    # FROM schema.table、CAST(x AS schema.type)
+            if qualifier.lower() not in refs.aliases:
+                if qualifier.lower() not in cte_names and qualifier.lower() not in table_lookup:
+                    errors.append(f"Unknown table or alias '{qualifier}' in '{qualifier}.{name}'")
+                continue
+            table_name = refs.aliases[qualifier.lower()]
+            if table_name is not None and not mschema.has_column(table_name, name) \
+                    and name.lower() not in column_lookup[table_name]:
+                errors.append(f"Unknown column '{qualifier}.{name}': table '{table_name}' has no column '{name}'")
+        elif token.kind == 'quoted' and not refs.unknown_tables and None not in refs.aliases.values():
+            lowered = name.lower()
+            if lowered in select_aliases or lowered in refs.aliases:
+                continue
+            if column_lookup and not any(lowered in columns for columns in column_lookup.values()):
+                errors.append(f"Unknown column '{name}' in tables {sorted(column_lookup.keys())}")
+
+    deduped = []
+    for error in errors:
+        if error not in deduped:
+            deduped.append(error)
+    return deduped
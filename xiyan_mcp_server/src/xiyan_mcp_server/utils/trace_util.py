@@ -0,0 +1,198 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# 耗时直方图的桶边界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STAGE_METRIC = "xiyan_stage_duration_seconds"
+
+_enabled = True
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, tuple], float] = {}
+_histograms: Dict[Tuple[str, tuple], list] = {}    # [各桶计数..., sum, count]
+_recent_traces = deque(maxlen=100)
+_current_trace = contextvars.ContextVar("xiyan_current_trace", default=None)
+
+
+def set_enabled(enabled: bool):
+    """关闭后 span/inc/observe 都直接返回，几乎没有开销"""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    """计数器累加"""
+    if not _enabled:
+        return
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def observe(name: str, value: float, **labels):
+    """直方图记录一次观测值"""
+    if not _enabled:
+        return
+    key = (name, _label_key(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * len(DEFAULT_BUCKETS) + [0.0, 0]
+        for idx, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                hist[idx] += 1
+        hist[-2] += value
+        hist[-1] += 1
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    计时一个阶段，退出时写入阶段耗时直方图，并追加到当前请求的 trace 中
+    异常退出的阶段会带上 error 属性
+    """
+    __slots__ = ('name', 'attrs', '_start')
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        observe(STAGE_METRIC, duration, stage=self.name)
+        spans = _current_trace.get()
+        if spans is not None:
+            record = {"stage": self.name, "duration_ms": round(duration * 1000, 3)}
+            if exc_type is not None:
+                record["error"] = exc_type.__name__
+            record.update(self.attrs)
+            spans.append(record)
+        return False
+
+    def set(self, **attrs):
+        """补充阶段属性，如返回行数、修复轮次"""
+        self.attrs.update(attrs)
+
+
+def span(name: str, **attrs):
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, **attrs)
+
+
+class Trace:
+    """一次请求的完整链路，内部的 span（包括子任务中的）都会记录到这里"""
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.spans: List[dict] = []
+        self._token = None
+        self._start = 0.0
+
+    def __enter__(self):
+        self._token = _current_trace.set(self.spans)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        _current_trace.reset(self._token)
+        observe(STAGE_METRIC, duration, stage=self.name)
+        record = {"name": self.name, "time": time.time(), "duration_ms": round(duration * 1000, 3),
+                  "spans": self.spans}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.attrs)
+        with _lock:
+            _recent_traces.append(record)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+def trace(name: str, **attrs):
+    if not _enabled:
+        return _NOOP_SPAN
+    return Trace(name, **attrs)
+
+
+def recent_traces(limit: Optional[int] = None) -> List[dict]:
+    with _lock:
+        traces = list(_recent_traces)
+    return traces[-limit:] if limit else traces
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ''
+    escaped = (f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in items)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    """整数按整数输出，其余用 repr 保留完整精度，避免大计数被输出成 1.23457e+06"""
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_prometheus() -> str:
+    """按 Prometheus 文本格式导出全部计数器和直方图"""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, list(v)) for k, v in _histograms.items())
+    lines = []
+    last_name = None
+    for (name, labels), value in counters:
+        if name != last_name:
+            lines.append(f"# TYPE {name} counter")
+            last_name = name
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    last_name = None
+    for (name, labels), hist in histograms:
+        if name != last_name:
+            lines.append(f"# TYPE {name} histogram")
+            last_name = name
+        for idx, bound in enumerate(DEFAULT_BUCKETS):
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {hist[idx]}")
+        lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {hist[-1]}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(hist[-2])}")
+        lines.append(f"{name}_count{_format_labels(labels)} {hist[-1]}")
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _recent_traces.clear()
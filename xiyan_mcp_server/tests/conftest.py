@@ -0,0 +1,32 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'xiyan_mcp_server'))
+
+from config.db_config import DBConfig
+from utils.db_util import init_db_conn
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """按给定的 SQL 语句创建临时 SQLite 库，返回 (Engine, 执行后续 SQL 的函数)"""
+    db_path = str(tmp_path / 'test.sqlite')
+    engines = []
+
+    def execute(*statements):
+        with sqlite3.connect(db_path) as connection:
+            for statement in statements:
+                connection.execute(statement)
+
+    def create(*statements):
+        execute(*statements)
+        engine = init_db_conn(DBConfig(dialect='sqlite', db_path=db_path))
+        engines.append(engine)
+        return engine, execute
+
+    yield create
+    for engine in engines:
+        engine.dispose()
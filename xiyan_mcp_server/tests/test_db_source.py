@@ -0,0 +1,91 @@
+import pytest
+
+from datasource.db_source import HITLSQLDatabase
+
+
+def read_all_pages(db_source, table_name, limit, **kwargs):
+    rows, cursors, cursor = [], [], None
+    while True:
+        page = db_source.preview_table(table_name, cursor=cursor, limit=limit, **kwargs)
+        rows.extend(page['rows'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return rows, cursors
+        cursors.append(cursor)
+
+
+def test_preview_table_keyset_single_pk(sqlite_db):
+    engine, _ = sqlite_db(
+        "CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, body TEXT, data BLOB)",
+        *[f"INSERT INTO items VALUES ({i}, 'item{i}', '{'x' * 50}', X'0102')" for i in range(1, 8)])
+    db_source = HITLSQLDatabase(engine, sample_examples=False)
+
+    page = db_source.preview_table('items', limit=3, max_cell_len=10)
+    assert page['columns'] == ['id', 'name', 'body', 'data']
+    assert [row[0] for row in page['rows']] == ['1', '2', '3']
+    assert len(page['rows'][0][2]) <= 10
+    assert page['rows'][0][3] == '<2 bytes>'
+
+    rows, cursors = read_all_pages(db_source, 'items', 3, columns=['name'])
+    assert [row[0] for row in rows] == [f'item{i}' for i in range(1, 8)]
+    assert len(cursors) == 2
+    # 游标里是上一页最后一行的主键，而不是偏移量
+    assert db_source.preview_table('items', columns=['id'], cursor=cursors[0], limit=1)['rows'] == [['4']]
+
+
+def test_preview_table_keyset_composite_pk(sqlite_db):
+    engine, _ = sqlite_db(
+        "CREATE TABLE pairs (a INTEGER, b TEXT, v INTEGER, PRIMARY KEY (a, b))",
+        *[f"INSERT INTO pairs VALUES ({a}, '{b}', {a * 10})" for a in (2, 1, 3) for b in ('y', 'x')])
+    db_source = HITLSQLDatabase(engine, sample_examples=False)
+
+    rows, cursors = read_all_pages(db_source, 'pairs', 4)
+    assert [row[:2] for row in rows] == [['1', 'x'], ['1', 'y'], ['2', 'x'], ['2', 'y'], ['3', 'x'], ['3', 'y']]
+    assert len(cursors) == 1
+
+
+def test_preview_table_without_pk_uses_offset(sqlite_db):
+    engine, _ = sqlite_db(
+        "CREATE TABLE logs (msg TEXT)",
+        *[f"INSERT INTO logs VALUES ('m{i}')" for i in range(5)])
+    db_source = HITLSQLDatabase(engine, sample_examples=False)
+
+    rows, cursors = read_all_pages(db_source, 'logs', 2)
+    assert sorted(row[0] for row in rows) == [f'm{i}' for i in range(5)]
+    assert len(cursors) == 2
+
+
+def test_preview_table_rejects_unknown_names_and_bad_cursors(sqlite_db):
+    engine, _ = sqlite_db("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    db_source = HITLSQLDatabase(engine, sample_examples=False)
+    with pytest.raises(ValueError, match="Unknown table"):
+        db_source.preview_table('missing')
+    with pytest.raises(ValueError, match="Unknown columns"):
+        db_source.preview_table('items', columns=['id', 'nope'])
+    with pytest.raises(ValueError, match="Invalid page cursor"):
+        db_source.preview_table('items', cursor='not-a-cursor')
+
+
+def test_refresh_mschema_add_alter_drop(sqlite_db):
+    engine, execute = sqlite_db(
+        "CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT)",
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id))",
+        "CREATE TABLE legacy (id INTEGER PRIMARY KEY)",
+        "INSERT INTO customers VALUES (1, 'Alice')")
+    db_source = HITLSQLDatabase(engine)
+    mschema = db_source.mschema
+    orders = mschema.tables['orders']
+    assert db_source.refresh_mschema() == {"added": [], "altered": [], "dropped": []}
+
+    execute("CREATE TABLE items (id INTEGER PRIMARY KEY, sku TEXT)",
+            "ALTER TABLE customers ADD COLUMN vip INTEGER",
+            "DROP TABLE legacy")
+    version = mschema.version
+    assert db_source.refresh_mschema() == {"added": ["items"], "altered": ["customers"], "dropped": ["legacy"]}
+    assert mschema.version > version
+    assert sorted(mschema.tables) == ['customers', 'items', 'orders']
+    assert 'vip' in mschema.tables['customers']['fields']
+    assert mschema.tables['orders'] is orders
+    assert mschema.foreign_keys == [['orders', 'customer_id', None, 'customers', 'id']]
+    assert '# Table: items' in mschema.to_mschema()
+    assert 'legacy' not in mschema.to_mschema()
@@ -0,0 +1,107 @@
+import threading
+
+from datasource.db_mschema import MSchema
+from datasource.schema_linker import get_schema_linker
+
+
+def test_add_field_after_render_invalidates_render_cache():
+    """user-013/user-022：渲染之后再 add_field，缓存的渲染结果不能继续返回"""
+    mschema = MSchema(db_id='d')
+    mschema.add_table('t')
+    mschema.add_field('t', 'a', 'INT')
+    assert '(a:INT)' in mschema.to_mschema(seed=0)
+
+    mschema.add_field('t', 'b', 'TEXT')
+    mschema.add_field('t', 'a', 'VARCHAR')
+    rendered = mschema.to_mschema(seed=0)
+    assert '(a:VARCHAR)' in rendered and '(b:TEXT)' in rendered
+    assert '(a:INT)' not in rendered
+
+    mschema.add_table('u')
+    mschema.add_field('u', 't_id', 'INT')
+    mschema.to_mschema(seed=0)
+    mschema.add_foreign_key('u', 't_id', None, 't', 'a')
+    assert 'u.t_id=t.a' in mschema.to_mschema(seed=0)
+
+
+def test_render_cache_hits_until_modified():
+    mschema = MSchema(db_id='d')
+    mschema.add_table('t')
+    mschema.add_field('t', 'a', 'INT', examples=['1', '2'])
+    first = mschema.to_mschema(seed=1)
+    assert mschema.to_mschema(seed=1) is first
+    assert mschema.to_mschema(seed=2) is not first
+
+    version = mschema.version
+    mschema.invalidate()
+    assert mschema.version == version + 1
+    assert mschema.to_mschema(seed=1) is not first
+
+
+def test_batch_update_invalidates_once_at_the_end():
+    """user-022：批量构建时只在结束时 invalidate 一次"""
+    mschema = MSchema(db_id='d')
+    version = mschema.version
+    with mschema.batch_update():
+        for t in range(3):
+            mschema.add_table(f't{t}')
+            with mschema.batch_update():
+                for c in range(5):
+                    mschema.add_field(f't{t}', f'c{c}', 'INT')
+            mschema.add_foreign_key(f't{t}', 'c0', None, 't0', 'c0')
+        assert mschema.version == version
+    assert mschema.version == version + 1
+    assert mschema.to_mschema(shuffle=False).count('(c4:INT)') == 3
+
+    with mschema.batch_update():
+        pass
+    assert mschema.version == version + 1
+
+
+def test_schema_linker_rebuilds_after_add_field():
+    mschema = MSchema(db_id='d')
+    mschema.add_table('orders')
+    mschema.add_field('orders', 'id', 'INT')
+    linker = get_schema_linker(mschema)
+    assert get_schema_linker(mschema) is linker
+
+    mschema.add_table('customers')
+    mschema.add_field('customers', 'nickname', 'TEXT')
+    rebuilt = get_schema_linker(mschema)
+    assert rebuilt is not linker
+    assert rebuilt.link('customer nickname') == ['customers']
+
+
+def test_render_during_replace_tables_is_consistent():
+    """user-021：增量刷新替换表的同时渲染，不会得到新旧混合的结果，也不会缓存过时结果"""
+    def build(field_type):
+        source = MSchema(db_id='d')
+        with source.batch_update():
+            for t in range(20):
+                source.add_table(f't{t}')
+                source.add_field(f't{t}', 'c', field_type)
+        return source
+
+    old, new = build('INT'), build('TEXT')
+    mschema = build('INT')
+    names = list(old.tables)
+    stop = threading.Event()
+    errors = []
+
+    def render():
+        while not stop.is_set():
+            rendered = mschema.to_mschema(seed=0)
+            if 'INT' in rendered and 'TEXT' in rendered:
+                errors.append(rendered)
+
+    threads = [threading.Thread(target=render) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for idx in range(200):
+        mschema.replace_tables(new if idx % 2 == 0 else old, names)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert 'INT' in mschema.to_mschema(seed=0) and 'TEXT' not in mschema.to_mschema(seed=0)
@@ -0,0 +1,75 @@
+import struct
+
+import pytest
+
+from datasource.db_mschema import MSchema
+from datasource.mschema_snapshot import FORMAT_VERSION, SnapshotError, load_snapshot, save_snapshot
+
+
+@pytest.fixture
+def mschema():
+    mschema = MSchema(db_id='shop', schema='main')
+    mschema.add_table('customers', comment='客户表')
+    mschema.add_field('customers', 'id', 'INTEGER', primary_key=True, nullable=False, autoincrement=True,
+                      examples=['1', '2'])
+    mschema.add_field('customers', 'name', 'VARCHAR(64)', comment='姓名', examples=['张三', 'Bob'])
+    mschema.add_table('orders')
+    mschema.add_field('orders', 'id', 'INTEGER', primary_key=True, nullable=False)
+    mschema.add_field('orders', 'customer_id', 'INTEGER', default=0, examples=['1'], category='Code')
+    mschema.add_foreign_key('orders', 'customer_id', None, 'customers', 'id')
+    mschema.fingerprints = {'customers': 'a', 'orders': 'b'}
+    mschema.invalidate()
+    return mschema
+
+
+def test_round_trip(tmp_path, mschema):
+    path = str(tmp_path / 'shop.xyms')
+    save_snapshot(mschema, path)
+    loaded = load_snapshot(path)
+    assert loaded.dump() == mschema.dump()
+    assert loaded.fingerprints == mschema.fingerprints
+    assert loaded.to_mschema(shuffle=False) == mschema.to_mschema(shuffle=False)
+
+    target = MSchema()
+    version = target.version
+    target.load_snapshot(path)
+    assert target.version > version
+    assert target.dump() == mschema.dump()
+
+
+def test_rejects_other_files_and_versions(tmp_path, mschema):
+    path = tmp_path / 'shop.xyms'
+    path.write_bytes(b'not a snapshot at all, definitely not' * 4)
+    with pytest.raises(SnapshotError, match='Not an M-Schema snapshot'):
+        load_snapshot(str(path))
+
+    save_snapshot(mschema, str(path))
+    data = bytearray(path.read_bytes())
+    struct.pack_into('<H', data, 4, FORMAT_VERSION + 1)
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError, match='Unsupported M-Schema snapshot version'):
+        load_snapshot(str(path))
+
+
+def test_truncated_files_raise_snapshot_error(tmp_path, mschema):
+    path = tmp_path / 'shop.xyms'
+    save_snapshot(mschema, str(path))
+    data = path.read_bytes()
+    for size in range(0, len(data), 7):
+        path.write_bytes(data[:size])
+        with pytest.raises(SnapshotError):
+            load_snapshot(str(path))
+
+
+def test_corrupt_files_raise_snapshot_error(tmp_path, mschema):
+    path = tmp_path / 'shop.xyms'
+    save_snapshot(mschema, str(path))
+    data = path.read_bytes()
+    for pos in range(16, len(data)):
+        corrupt = bytearray(data)
+        corrupt[pos] ^= 0xFF
+        path.write_bytes(bytes(corrupt))
+        try:
+            load_snapshot(str(path))
+        except SnapshotError:
+            pass
@@ -0,0 +1,65 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from utils.query_guard import QueryCostError, check_query_cost, estimate_query_cost
+
+
+class FakeConnection:
+    """只返回给定 EXPLAIN 结果的连接，用于没有 MySQL/PostgreSQL 的环境"""
+    def __init__(self, dialect, plan):
+        self.dialect = SimpleNamespace(name=dialect)
+        self.plan = plan
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(str(statement))
+        return SimpleNamespace(scalar=lambda: self.plan)
+
+
+# SELECT * FROM orders o JOIN customers c ON ... LIMIT 100
+PG_LIMIT_PLAN = [{"Plan": {
+    "Node Type": "Limit", "Plan Rows": 100, "Total Cost": 12.5,
+    "Plans": [{
+        "Node Type": "Hash Join", "Plan Rows": 500000, "Total Cost": 62000.0,
+        "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "orders", "Plan Rows": 2000000, "Total Cost": 35000.0},
+            {"Node Type": "Hash", "Plan Rows": 1000, "Total Cost": 20.0,
+             "Plans": [{"Node Type": "Index Scan", "Relation Name": "customers", "Plan Rows": 1000,
+                        "Total Cost": 20.0}]},
+        ],
+    }],
+}}]
+
+
+def test_postgresql_rows_are_the_largest_scan_or_join():
+    """user-017：根节点是 LIMIT 时，按扫描/连接节点的估算行数判断"""
+    connection = FakeConnection('postgresql', PG_LIMIT_PLAN)
+    assert estimate_query_cost(connection, "SELECT 1") == (2000000.0, 12.5)
+    assert connection.statements == ["EXPLAIN (FORMAT JSON) SELECT 1"]
+
+    connection = FakeConnection('postgresql', json.dumps(
+        [{"Plan": {"Node Type": "Result", "Plan Rows": 1, "Total Cost": 0.01}}]))
+    assert estimate_query_cost(connection, "SELECT 1") == (1.0, 0.01)
+
+
+def test_mysql_rows_are_the_largest_examined():
+    plan = {"query_block": {"cost_info": {"query_cost": "1520.5"}, "nested_loop": [
+        {"table": {"rows_examined_per_scan": 15000, "rows_produced_per_join": 15000}},
+        {"table": {"rows_examined_per_scan": 1, "rows_produced_per_join": 15000}}]}}
+    connection = FakeConnection('mysql', json.dumps(plan))
+    assert estimate_query_cost(connection, "SELECT 1") == (15000.0, 1520.5)
+
+
+def test_check_query_cost_rejects_large_scans_behind_limit():
+    connection = FakeConnection('postgresql', PG_LIMIT_PLAN)
+    with pytest.raises(QueryCostError, match="estimated 2000000 rows"):
+        check_query_cost(connection, "SELECT 1", max_rows=100000)
+    check_query_cost(connection, "SELECT 1", max_rows=5000000, max_cost=100)
+    with pytest.raises(QueryCostError, match="estimated cost"):
+        check_query_cost(connection, "SELECT 1", max_cost=10)
+
+
+def test_sqlite_has_no_estimate():
+    assert estimate_query_cost(FakeConnection('sqlite', None), "SELECT 1") == (None, None)
@@ -0,0 +1,88 @@
+import json
+import time
+from types import SimpleNamespace
+
+from database_env import DataBaseEnv
+from datasource.db_mschema import MSchema
+from utils.question_cache import QuestionSQLCache, literal_tokens, normalize_question
+
+
+def test_normalized_questions_hit_the_same_entry():
+    cache = QuestionSQLCache()
+    cache.put("How many orders are there?", 'h1', "SELECT COUNT(*) FROM orders")
+    assert cache.get("  how many ORDERS are there ", 'h1') == "SELECT COUNT(*) FROM orders"
+    assert cache.get("How many orders are there？", 'h1') == "SELECT COUNT(*) FROM orders"
+    assert cache.get("How many orders are there?", 'h2') is None
+    assert normalize_question("ＡＢＣ，  d") == "abc d"
+
+    assert cache.invalidate("how many orders are there", 'h1')
+    assert cache.get("How many orders are there?", 'h1') is None
+
+
+def test_similar_questions_require_equal_literals():
+    """user-010：近似匹配时，数字和引号内的字面量不同的问题不能命中"""
+    cache = QuestionSQLCache(similarity_threshold=0.6)
+    cache.put("2023年销售额最高的前10个商品", 'h', "SELECT ... 2023 ... LIMIT 10")
+    assert cache.get("2023年销售额最高的前10个商品是哪些", 'h') == "SELECT ... 2023 ... LIMIT 10"
+    assert cache.get("2024年销售额最高的前10个商品", 'h') is None
+    assert cache.get("2023年销售额最高的前100个商品", 'h') is None
+    assert cache.get("2023年销售额最高的前十个商品", 'h') is None
+
+    cache.put('orders from customer "Alice" last week', 'h', "SELECT ... 'Alice'")
+    assert cache.get('show orders from customer "Alice" last week', 'h') == "SELECT ... 'Alice'"
+    assert cache.get('orders from customer "Alicia" last week', 'h') is None
+    assert literal_tokens('top 10 in "x" 三月') == ('10', '"x"', '三')
+
+
+def test_ttl_expires_entries():
+    cache = QuestionSQLCache(ttl=0.05)
+    cache.put("q", 'h', "SELECT 1")
+    assert cache.get("q", 'h') == "SELECT 1"
+    time.sleep(0.1)
+    assert cache.get("q", 'h') is None
+
+
+def test_persistence_is_debounced_and_reloaded(tmp_path):
+    """user-010：put 不同步写文件，延迟合并写入，flush 立即落盘，重新加载后字面量仍然生效"""
+    path = tmp_path / 'questions.json'
+    cache = QuestionSQLCache(persist_path=str(path), persist_delay=60, similarity_threshold=0.6)
+    cache.put("2023年的订单数量", 'h', "SELECT 2023")
+    cache.put("2023年的客户数量", 'h', "SELECT c2023")
+    assert not path.exists()
+
+    cache.flush()
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert sorted(item['sql'] for item in data) == ["SELECT 2023", "SELECT c2023"]
+    assert data[0]['literals'] == ['2023']
+
+    reloaded = QuestionSQLCache(persist_path=str(path), similarity_threshold=0.6)
+    assert reloaded.get("2023年的订单数量", 'h') == "SELECT 2023"
+    assert reloaded.get("2023年的订单数量有多少", 'h') == "SELECT 2023"
+    assert reloaded.get("2024年的订单数量有多少", 'h') is None
+
+
+def test_persistence_timer_flushes_in_background(tmp_path):
+    path = tmp_path / 'questions.json'
+    cache = QuestionSQLCache(persist_path=str(path), persist_delay=0.05)
+    cache.put("q", 'h', "SELECT 1")
+    deadline = time.time() + 5
+    while not path.exists() and time.time() < deadline:
+        time.sleep(0.02)
+    assert json.loads(path.read_text(encoding='utf-8'))[0]['sql'] == "SELECT 1"
+
+
+def test_mschema_hash_ignores_resampled_examples():
+    """user-010：重新采样示例值不改变缓存使用的 M-Schema 哈希，结构变化才改变"""
+    mschema = MSchema(db_id='d')
+    mschema.add_table('t')
+    mschema.add_field('t', 'a', 'INT', examples=['1', '2'])
+
+    def env():
+        database = SimpleNamespace(dialect='sqlite', mschema=mschema, db_name='d')
+        return DataBaseEnv(database)
+
+    before = env().mschema_hash
+    mschema.add_field('t', 'a', 'INT', examples=['7', '8'])
+    assert env().mschema_hash == before
+    mschema.add_field('t', 'b', 'TEXT')
+    assert env().mschema_hash != before
@@ -0,0 +1,56 @@
+import pytest
+
+from datasource.db_source import HITLSQLDatabase
+from utils.result_cache import ResultCache
+
+
+@pytest.fixture
+def db_source(sqlite_db):
+    engine, _ = sqlite_db(
+        "CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)",
+        "CREATE TABLE other (id INTEGER PRIMARY KEY)",
+        "INSERT INTO t VALUES (1, 'a'), (2, 'b')",
+        "INSERT INTO other VALUES (1)")
+    return HITLSQLDatabase(engine, sample_examples=False, result_cache=ResultCache(max_bytes=1024 * 1024))
+
+
+def count(db_source, table_name='t'):
+    ok, res = db_source.fetch_truncated_with_status(f"SELECT COUNT(*) FROM {table_name}", max_rows=10)
+    assert ok
+    return res['truncated_results'][0][0]
+
+
+def test_reads_are_cached(db_source, sqlite_db):
+    assert count(db_source) == 2
+    # 绕过本服务写入，缓存期内看不到变化
+    _, execute = sqlite_db()
+    execute("DELETE FROM t")
+    assert count(db_source) == 2
+    assert db_source.invalidate_cached_results(['t']) == 1
+    assert count(db_source) == 0
+
+
+@pytest.mark.parametrize("write", [
+    lambda db, sql: db.fetch_truncated_with_status(sql),
+    lambda db, sql: db.fetch(sql),
+    lambda db, sql: db.fetch_with_column_name(sql),
+    lambda db, sql: db.fetch_with_error_info(sql),
+    lambda db, sql: db.execute(sql),
+])
+def test_write_then_cached_read(db_source, write):
+    """user-011：本服务执行写操作后，引用该表的缓存结果失效，其他表的缓存保留"""
+    assert count(db_source) == 2
+    assert count(db_source, 'other') == 1
+    assert db_source.fetch("SELECT name FROM t ORDER BY id") == (True, [('a',), ('b',)])
+
+    write(db_source, "DELETE FROM t WHERE id = 1")
+
+    assert count(db_source) == 1
+    assert db_source.fetch("SELECT name FROM t ORDER BY id") == (True, [('b',)])
+    assert len(db_source._result_cache) == 3
+
+
+def test_failed_statements_are_not_cached(db_source):
+    ok, _ = db_source.fetch_truncated_with_status("SELECT nope FROM t")
+    assert not ok
+    assert len(db_source._result_cache) == 0
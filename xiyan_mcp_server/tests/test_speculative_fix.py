@@ -0,0 +1,134 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import server
+from datasource.db_source import HITLSQLDatabase
+
+DB_ENV = SimpleNamespace(dialect='sqlite')
+
+
+@pytest.fixture
+def candidates(monkeypatch):
+    """
+    script[idx] = (LLM 耗时, 生成的 SQL 或异常, 执行耗时, 执行是否成功)，SQL 自带 LIMIT，push_down_limit 不改写；
+    候选任务按创建顺序调用 sql_fix，
+    第 idx 次调用对应第 idx 个候选；记录每个候选的执行和取消情况
+    """
+    state = SimpleNamespace(script=[], executed=[], cancelled=[], calls=0)
+
+    async def fake_sql_fix(dialect, mschema, query, sql_query, error_info, temperature=None):
+        delay, sql = state.script[state.calls][:2]
+        state.calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            state.cancelled.append(sql)
+            raise
+        if isinstance(sql, Exception):
+            raise sql
+        return sql
+
+    async def fake_execute_sql(db_env, sql_query):
+        _, _, delay, ok = next(item for item in state.script if item[1] == sql_query)
+        state.executed.append(sql_query)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            state.cancelled.append(sql_query)
+            raise
+        return ok, {"truncated_results": [] if ok else f"error in {sql_query}", "fields": []}
+
+    def run(num_candidates):
+        state.calls = 0
+        return asyncio.run(server.speculative_sql_fix(DB_ENV, 'schema', 'q', 'SELECT bad', 'error', num_candidates))
+
+    monkeypatch.setattr(server, 'sql_fix', fake_sql_fix)
+    monkeypatch.setattr(server, 'execute_sql', fake_execute_sql)
+    state.run = run
+    return state
+
+
+def test_first_successful_candidate_wins_and_others_are_cancelled(candidates):
+    """user-014：第一个执行成功的候选胜出，仍在生成或执行中的候选被取消"""
+    candidates.script = [
+        (0.01, "SELECT 1 LIMIT 1", 0.01, False),   # 最先完成，但执行失败
+        (0.05, "SELECT 2 LIMIT 1", 0.01, True),    # 胜出
+        (2.00, "SELECT 3 LIMIT 1", 0.01, True),    # LLM 还在生成
+        (0.03, "SELECT 4 LIMIT 1", 2.00, True),    # 还在执行
+    ]
+    start = time.monotonic()
+    status, sql, res = candidates.run(4)
+    assert (status, sql) == (True, "SELECT 2 LIMIT 1")
+    assert time.monotonic() - start < 1.0
+    assert sorted(candidates.cancelled) == ["SELECT 3 LIMIT 1", "SELECT 4 LIMIT 1"]
+    assert "SELECT 3 LIMIT 1" not in candidates.executed
+
+
+def test_all_failed_returns_first_failure(candidates):
+    candidates.script = [
+        (0.03, "SELECT 1 LIMIT 1", 0.0, False),
+        (0.01, "SELECT 2 LIMIT 1", 0.0, False),
+    ]
+    status, sql, res = candidates.run(2)
+    assert (status, sql) == (False, "SELECT 2 LIMIT 1")
+    assert res["truncated_results"] == "error in SELECT 2 LIMIT 1"
+
+
+def test_duplicate_candidates_are_executed_once(candidates):
+    candidates.script = [
+        (0.01, "SELECT 1 LIMIT 1", 0.0, False),
+        (0.02, "SELECT 1 LIMIT 1", 0.0, False),
+    ]
+    status, sql, _ = candidates.run(2)
+    assert (status, sql) == (False, "SELECT 1 LIMIT 1")
+    assert candidates.executed == ["SELECT 1 LIMIT 1"]
+
+
+def test_llm_errors(candidates):
+    candidates.script = [
+        (0.01, RuntimeError("LLM unavailable"), 0.0, False),
+        (0.02, "SELECT 2 LIMIT 1", 0.0, True),
+    ]
+    assert candidates.run(2)[:2] == (True, "SELECT 2 LIMIT 1")
+
+    candidates.script = [(0.01, RuntimeError("LLM unavailable"), 0.0, False)]
+    with pytest.raises(RuntimeError, match="LLM unavailable"):
+        candidates.run(1)
+
+
+def test_cancelled_execution_interrupts_the_query(sqlite_db, monkeypatch):
+    """被取消的候选会中断数据库中正在执行的查询，而不是等它跑完"""
+    engine, _ = sqlite_db("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+    database = HITLSQLDatabase(engine, sample_examples=False)
+    finished = []
+    fetch = database.fetch_truncated_with_status
+
+    def timed_fetch(*args, **kwargs):
+        start = time.monotonic()
+        result = fetch(*args, **kwargs)
+        finished.append((time.monotonic() - start, result))
+        return result
+
+    monkeypatch.setattr(database, 'fetch_truncated_with_status', timed_fetch)
+    db_env = SimpleNamespace(database=database, dialect='sqlite')
+    slow_sql = ("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) "
+                "SELECT COUNT(*) FROM c")
+
+    async def run():
+        task = asyncio.create_task(server.execute_sql(db_env, slow_sql))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    deadline = time.monotonic() + 10
+    while not finished and time.monotonic() < deadline:
+        time.sleep(0.05)
+    elapsed, (status, res) = finished[0]
+    assert elapsed < 5
+    assert not status
+    assert "cancelled" in res["truncated_results"]
@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils import llm_util
+from utils.file_util import SQLBlockScanner, extract_sql_from_qwen
+
+OUTPUT = "Let me think.\n```sql\nSELECT `a` FROM t WHERE b = 'x'\n```\nFixed version:\n```sql\nSELECT 2\n```\nDone."
+
+
+def split_at(text, *positions):
+    bounds = [0, *positions, len(text)]
+    return [text[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+
+def feed_all(chunks):
+    scanner = SQLBlockScanner()
+    results = [scanner.feed(chunk) for chunk in chunks]
+    return scanner, results
+
+
+def test_scanner_matches_regex_on_every_split():
+    """user-016：起止标记被切断在任意位置时，结果都与一次性提取第一个代码块相同"""
+    text = "Answer:\n```sql\nSELECT * FROM orders\nWHERE id > 10\n```\ntrailing"
+    expected = "SELECT * FROM orders\nWHERE id > 10"
+    for i in range(1, len(text)):
+        for j in range(i, len(text), 7):
+            scanner, results = feed_all(split_at(text, i, j))
+            assert scanner.sql == expected, (i, j)
+            assert scanner.text == text
+            first = next(idx for idx, sql in enumerate(results) if sql is not None)
+            assert all(sql is None for sql in results[:first])
+
+
+def test_scanner_returns_first_block_and_keeps_later_text():
+    chunks = [OUTPUT[i:i + 3] for i in range(0, len(OUTPUT), 3)]
+    scanner, results = feed_all(chunks)
+    assert scanner.sql == "SELECT `a` FROM t WHERE b = 'x'"
+    assert results[-1] == scanner.sql
+    assert scanner.text == OUTPUT
+    assert extract_sql_from_qwen(scanner.text) == "SELECT 2"
+
+
+def test_scanner_without_closed_block():
+    scanner, results = feed_all(["```sq", "l\nSELECT 1", "\n``", ""])
+    assert results == [None, None, None, None]
+    assert scanner.sql is None
+
+
+class FakeStream:
+    def __init__(self, chunks, usage=None):
+        self.items = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=c))], usage=None)
+                      for c in chunks]
+        if usage is not None:
+            self.items.append(SimpleNamespace(choices=[], usage=usage))
+        self.consumed = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.consumed >= len(self.items):
+            raise StopAsyncIteration
+        self.consumed += 1
+        return self.items[self.consumed - 1]
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    def create_stream(chunks):
+        stream = FakeStream(chunks, usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+
+        async def create(**kwargs):
+            stream.kwargs = kwargs
+            return stream
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        monkeypatch.setattr(llm_util, 'get_async_llm_client', lambda *args: client)
+        return stream
+
+    return create_stream
+
+
+def stream_sql(**kwargs):
+    return asyncio.run(llm_util.astream_dashscope_sql(key='k', url='http://localhost', model='m', messages=[],
+                                                      **kwargs))
+
+
+def test_stream_stops_at_first_block(fake_stream):
+    stream = fake_stream([OUTPUT[i:i + 4] for i in range(0, len(OUTPUT), 4)])
+    assert stream_sql() == "SELECT `a` FROM t WHERE b = 'x'"
+    assert stream.closed
+    assert stream.consumed < len(stream.items)
+    assert stream.kwargs['stream'] is True
+    assert stream.kwargs['stream_options'] == {"include_usage": True}
+
+
+def test_stream_returns_last_block_for_sql_fix(fake_stream):
+    """sql_fix 的输出可能先复述原 SQL，再给出修正后的 SQL，需要读完整个输出"""
+    stream = fake_stream([OUTPUT[i:i + 4] for i in range(0, len(OUTPUT), 4)])
+    assert stream_sql(stop_at_first_block=False) == "SELECT 2"
+    assert stream.closed
+    assert stream.consumed == len(stream.items)
+
+
+def test_stream_without_closed_block_returns_no_sql(fake_stream):
+    fake_stream(["SELECT 1", " FROM t"])
+    assert stream_sql() == ""
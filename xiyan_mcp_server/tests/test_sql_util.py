@@ -0,0 +1,66 @@
+import pytest
+
+from utils.sql_util import extract_table_names, is_select_statement, normalize_sql, push_down_limit, \
+    significant_tokens, strip_statement, tokenize_sql
+
+
+def kinds(sql, dialect='mysql'):
+    return [(t.kind, t.value) for t in significant_tokens(tokenize_sql(sql, dialect))]
+
+
+def test_tokenize_strings_and_identifiers_by_dialect():
+    assert kinds("SELECT `a b`, \"x\" FROM t", 'mysql') == [
+        ('word', 'SELECT'), ('quoted', '`a b`'), ('op', ','), ('string', '"x"'), ('word', 'FROM'), ('word', 't')]
+    assert kinds('SELECT "a b" FROM [t]', 'sqlite')[1] == ('quoted', '"a b"')
+    assert kinds('SELECT "a b" FROM [t]', 'sqlite')[-1] == ('quoted', '[t]')
+    assert kinds("SELECT $tag$ it's ; $tag$", 'postgresql')[1] == ('string', "$tag$ it's ; $tag$")
+
+
+def test_tokenize_escapes_comments_and_depth():
+    assert kinds(r"SELECT 'it\'s', 'a''b'")[1:] == [('string', r"'it\'s'"), ('op', ','), ('string', "'a''b'")]
+    tokens = tokenize_sql("SELECT 1 -- tail ; DROP\n/* x */ FROM (SELECT 2)")
+    assert [t.value for t in tokens if t.kind == 'comment'] == ['-- tail ; DROP', '/* x */']
+    depths = {t.value: t.depth for t in significant_tokens(tokens)}
+    assert depths['1'] == 0 and depths['2'] == 1
+    assert ('op', '::') in kinds("SELECT x::int", 'postgresql')
+    assert ('param', ':name') in kinds("SELECT * FROM t WHERE a = :name")
+
+
+def test_strip_statement_and_is_select():
+    assert normalize_sql("  SELECT  1 ;\n-- done\n ") == "SELECT 1"
+    assert is_select_statement(strip_statement("WITH t AS (SELECT 1) SELECT * FROM t"))
+    assert is_select_statement(strip_statement("SELECT REPLACE(name, 'a', 'b') FROM t"))
+    assert not is_select_statement(strip_statement("SELECT 1; DROP TABLE t"))
+    assert not is_select_statement(strip_statement("DELETE FROM t"))
+    assert not is_select_statement(strip_statement("SELECT * INTO t2 FROM t"))
+
+
+@pytest.mark.parametrize("sql, dialect, expected", [
+    ("SELECT * FROM t", 'mysql', "SELECT * FROM t\nLIMIT 10"),
+    ("SELECT * FROM t;", 'mysql', "SELECT * FROM t\nLIMIT 10"),
+    ("SELECT * FROM t LIMIT 100", 'mysql', "SELECT * FROM t LIMIT 10"),
+    ("SELECT * FROM t LIMIT 5", 'mysql', "SELECT * FROM t LIMIT 5"),
+    ("SELECT * FROM t LIMIT 20, 100", 'mysql', "SELECT * FROM t LIMIT 20, 10"),
+    ("SELECT * FROM t LIMIT ALL", 'postgresql', "SELECT * FROM t LIMIT 10"),
+    ("SELECT * FROM t OFFSET 5", 'postgresql', "SELECT * FROM t LIMIT 10 OFFSET 5"),
+    ("SELECT * FROM (SELECT * FROM t LIMIT 100) s", 'mysql', "SELECT * FROM (SELECT * FROM t LIMIT 100) s\nLIMIT 10"),
+    ("SELECT 'LIMIT 100' FROM t", 'mysql', "SELECT 'LIMIT 100' FROM t\nLIMIT 10"),
+])
+def test_push_down_limit(sql, dialect, expected):
+    assert push_down_limit(sql, 10, dialect) == expected
+
+
+@pytest.mark.parametrize("sql, dialect", [
+    ("SELECT * FROM t LIMIT :n", 'mysql'),
+    ("SELECT * FROM t FOR UPDATE", 'mysql'),
+    ("SELECT * FROM t FETCH FIRST 5 ROWS ONLY", 'postgresql'),
+    ("UPDATE t SET a = 1", 'mysql'),
+    ("SELECT * FROM t", 'oracle'),
+])
+def test_push_down_limit_leaves_unsafe_queries_unchanged(sql, dialect):
+    assert push_down_limit(sql, 10, dialect) == sql
+
+
+def test_extract_table_names():
+    assert extract_table_names("SELECT * FROM `Orders` o JOIN users u", ['orders', 'users', 'items']) == \
+        ['orders', 'users']
@@ -0,0 +1,52 @@
+import pytest
+
+from datasource.db_mschema import MSchema
+from utils.sql_validator import validate_sql
+
+
+@pytest.fixture
+def mschema():
+    mschema = MSchema(db_id='shop')
+    mschema.add_table('orders')
+    mschema.add_table('customers')
+    for field in ['id', 'customer_id', 'amount', 'created_at']:
+        mschema.add_field('orders', field, 'INT', primary_key=field == 'id')
+    for field in ['id', 'name']:
+        mschema.add_field('customers', field, 'TEXT', primary_key=field == 'id')
+    mschema.invalidate()
+    return mschema
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT o.id, c.name FROM orders o JOIN customers c ON o.customer_id = c.id",
+    "SELECT c.name FROM orders o, customers AS c WHERE c.id = o.customer_id",
+    "WITH t AS (SELECT customer_id, SUM(amount) s FROM orders GROUP BY customer_id) SELECT t.s FROM t",
+    "SELECT a.cnt FROM (SELECT COUNT(*) cnt FROM orders) a",
+    "SELECT EXTRACT(YEAR FROM created_at) FROM orders",
+    "SELECT `name` AS `n` FROM customers ORDER BY `n`",
+    "SELECT ORDERS.ID FROM Orders",
+    "SELECT 1 FROM dual",
+    "SELECT NOW() FROM DUAL d",
+    "SELECT g FROM generate_series(1, 3) AS g",
+    "SELECT x FROM unnest(ARRAY[1, 2]) AS t(x) JOIN orders o ON o.id = t.x",
+    "DELETE FROM missing",
+])
+def test_valid_sql(mschema, sql):
+    assert validate_sql(sql, mschema) == []
+
+
+@pytest.mark.parametrize("sql, error", [
+    ("", "No SQL statement found in the model output"),
+    ("SELECT (1", "Unbalanced parentheses in SQL"),
+    ("SELECT * FROM order_items", "Table 'order_items' doesn't exist"),
+    ("SELECT n.x FROM nope n", "Table 'nope' doesn't exist"),
+    ("SELECT o.idx FROM orders o", "Unknown column 'o.idx': table 'orders' has no column 'idx'"),
+    ("SELECT x.id FROM orders o", "Unknown table or alias 'x' in 'x.id'"),
+    ("SELECT `nam` FROM customers", "Unknown column 'nam' in tables ['customers']"),
+    ("SELECT * FROM json_table('[1]', '$[*]' COLUMNS (v INT PATH '$')) jt JOIN nope ON 1 = 1",
+     "Table 'nope' doesn't exist"),
+    ("SELECT g, c.nme FROM generate_series(1, 3) AS g, customers c",
+     "Unknown column 'c.nme': table 'customers' has no column 'nme'"),
+])
+def test_invalid_sql(mschema, sql, error):
+    assert validate_sql(sql, mschema) == [error]